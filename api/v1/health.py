@@ -4,8 +4,13 @@ from datetime import datetime
 
 import psutil
 from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
 
-from app.schemas import DebugInfo, HealthResponse
+from app.repositories import telegram_repository
+from app.schemas import DebugInfo, HealthResponse, ReadinessResponse
+from core import config
+from core.cache import parse_cache, response_cache
 
 router = APIRouter()
 
@@ -22,4 +27,30 @@ async def health_check():
         pid=pid, ppid=ppid, sys_platform=sys_platform, uptime=uptime, now=now
     )
 
-    return HealthResponse(debug_info=debug_info, is_healthy=True)
+    caches = {
+        "parse": {
+            "hits": parse_cache.hits,
+            "misses": parse_cache.misses,
+            "size": parse_cache.get_cache_size(),
+        },
+        "responses": {
+            "hits": response_cache.hits,
+            "stale_hits": response_cache.stale_hits,
+            "misses": response_cache.misses,
+            "size": response_cache.get_cache_size(),
+        },
+    }
+
+    return HealthResponse(debug_info=debug_info, is_healthy=True, caches=caches)
+
+
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    readiness = ReadinessResponse(
+        is_ready=telegram_repository.ready,
+        warm_up_level=telegram_repository.warm_up_level.name.lower(),
+        required_level=config.WARM_UP_LEVEL.lower(),
+    )
+    # Load balancers hold traffic back until warm-up reaches the required level
+    status_code = 200 if readiness.is_ready else 503
+    return JSONResponse(jsonable_encoder(readiness), status_code=status_code)
@@ -1,46 +1,91 @@
 from io import BytesIO
+from typing import List, Union
+from uuid import uuid4
 
 from fastapi import APIRouter, HTTPException, Header, Query, Request
 from fastapi.encoders import jsonable_encoder
-from starlette.responses import JSONResponse, StreamingResponse
+from starlette.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 
 from app.repositories import telegram_repository
-from app.schemas import PaginationData, PaginatedPosts, Post
+from app.schemas import (
+    FilteredPosts,
+    ImageSize,
+    PaginationData,
+    PaginatedPosts,
+    Post,
+    TopWindow,
+)
+from core import config
+from core.cache import response_cache
+from core.exceptions import (
+    BadRequestException,
+    CustomException,
+    NotFoundException,
+)
+from core.utils import (
+    http_date,
+    if_range_matches,
+    is_not_modified,
+    make_etag,
+    parse_range_header,
+    plan_range,
+)
 
 router = APIRouter()
 
+# Maximum number of posts looked up by one /posts?ids= request
+MAX_BATCH_POSTS = 100
+
 
 @router.get(
     "/posts",
     tags=["Post"],
     operation_id="paginate.posts",
-    response_model=PaginatedPosts,
+    response_model=Union[PaginatedPosts, List[Post]],
 )
 async def paginate(
     request: Request,
     per_page: int = Query(10),
     offset_id: int = Query(0),
     search: str = Query(None),
+    cursor: str = Query(None),
+    ids: List[str] = Query(None),
 ):
     try:
-        pagination_data = PaginationData.from_parameters(
-            per_page=per_page, offset_id=offset_id, search=search
-        )
-
-        data = await telegram_repository.paginate_posts(pagination_data)
-
         host = request.headers["host"]
         protocol = request.url.scheme
 
-        for post in data.data:
-            image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
-            video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+        if ids:
+            return await _get_posts(protocol, host, _parse_ids(ids))
 
-            post.image_url = image_url
-            post.video_url = video_url
+        async def render():
+            pagination_data = PaginationData.from_parameters(
+                per_page=per_page, offset_id=offset_id, search=search, cursor=cursor
+            )
+
+            data = await telegram_repository.paginate_posts(pagination_data)
+
+            for post in data.data:
+                image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
+                video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+
+                post.image_url = image_url
+                post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+                post.video_url = video_url
 
-        json_data = jsonable_encoder(data)
-        return JSONResponse(json_data)
+            return JSONResponse(jsonable_encoder(data)).body
+
+        body = await response_cache.get_or_set(
+            ("posts", protocol, host, per_page, offset_id, cursor), render
+        )
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         print(e)
         print(e.__class__)
@@ -48,60 +93,189 @@ async def paginate(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get(
+def _parse_ids(ids: List[str]) -> List[int]:
+    """
+    Reads the IDs of a batch lookup, given repeated (?ids=1&ids=2) or
+    comma separated (?ids=1,2).
+    """
+    try:
+        message_ids = [int(value) for item in ids for value in item.split(",") if value]
+    except ValueError:
+        raise BadRequestException("Invalid ids")
+    message_ids = list(dict.fromkeys(message_ids))
+    if len(message_ids) > MAX_BATCH_POSTS:
+        raise BadRequestException(f"At most {MAX_BATCH_POSTS} ids per request")
+    return message_ids
+
+
+async def _get_posts(protocol: str, host: str, message_ids: List[int]) -> Response:
+    async def render():
+        posts = await telegram_repository.get_posts(message_ids)
+
+        for post in posts:
+            image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
+            video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+
+            post.image_url = image_url
+            post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+            post.video_url = video_url
+
+        return JSONResponse(jsonable_encoder(posts)).body
+
+    body = await response_cache.get_or_set(
+        ("posts", protocol, host, tuple(message_ids)), render
+    )
+    return Response(body, media_type="application/json")
+
+
+@router.api_route(
     "/posts/images/{message_id}",
+    methods=["GET", "HEAD"],
     tags=["Post"],
     operation_id="get.post.image",
     response_class=StreamingResponse,
 )
-async def stream_image(message_id: int):
+async def stream_image(
+    request: Request,
+    message_id: int,
+    size: ImageSize = Query(ImageSize.FULL),
+    if_none_match: str | None = Header(None),
+):
     try:
-        image_bytes = await telegram_repository.get_image(message_id)
-        return StreamingResponse(BytesIO(image_bytes), media_type="image/jpeg")
+        stored = await telegram_repository.get_image_file(message_id, size)
+        if stored is not None:
+            key, path = stored
+        else:
+            key, image_bytes = await telegram_repository.get_image(message_id, size)
+
+        # The photo of a post can change when it is edited, its content key can't
+        headers = {
+            "ETag": make_etag("image", key),
+            "Cache-Control": f"public, max-age={config.IMAGE_CACHE_MAX_AGE}",
+        }
+        if is_not_modified(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        if stored is not None:
+            return FileResponse(path, headers=headers, media_type="image/jpeg")
+
+        headers["Content-Length"] = str(len(image_bytes))
+        if request.method == "HEAD":
+            return Response(headers=headers, media_type="image/jpeg")
+
+        return StreamingResponse(
+            BytesIO(image_bytes), media_type="image/jpeg", headers=headers
+        )
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get(
+async def _multipart_byteranges(
+    message_id: int, document_id: int, plans, boundary: str, size: int
+):
+    for plan in plans:
+        yield _multipart_part_header(plan, boundary, size)
+        async for chunk in telegram_repository.get_video(
+            message_id, document_id, plan.start, plan.end
+        ):
+            yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def _multipart_part_header(plan, boundary: str, size: int) -> bytes:
+    return (
+        f"\r\n--{boundary}\r\n"
+        f"Content-Type: video/mp4\r\n"
+        f"Content-Range: bytes {plan.start}-{plan.end}/{size}\r\n\r\n"
+    ).encode()
+
+
+@router.api_route(
     "/posts/stream",
+    methods=["GET", "HEAD"],
     tags=["Post"],
     operation_id="get.post.video",
     response_class=StreamingResponse,
 )
 async def stream_video(
+    request: Request,
     message_id: int = Query(...),
     document_id: int = Query(...),
     size: int = Query(...),
     range_header: str | None = Header(None, alias="range"),
+    if_none_match: str | None = Header(None),
+    if_range: str | None = Header(None),
 ):
     try:
-        if not range_header:
-            return StreamingResponse(
-                telegram_repository.get_video(message_id, document_id, 0, size - 1),
-                media_type="video/mp4",
-                headers={
-                    "Content-Type": "video/mp4",
-                    "Content-Length": str(size),
-                    "Accept-Ranges": "bytes",
-                },
+        document = await telegram_repository.get_document(message_id, document_id)
+        size = document.size or size
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": make_etag(document.id),
+        }
+        last_modified = http_date(getattr(document, "date", None))
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+
+        if is_not_modified(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        client_host = request.client.host if request.client else ""
+        client_key = f"{client_host}|{request.headers.get('user-agent', '')}"
+
+        ranges = None
+        if range_header and if_range_matches(if_range, headers["ETag"], last_modified):
+            ranges = parse_range_header(range_header, size)
+
+        if ranges == []:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+        if ranges is None:
+            status_code = 200
+            headers["Content-Length"] = str(size)
+            media_type = "video/mp4"
+            stream = telegram_repository.get_video(
+                message_id, document_id, 0, size - 1, client_key
+            )
+        elif len(ranges) == 1:
+            plan = plan_range(*ranges[0], size)
+            status_code = 206
+            headers["Content-Range"] = f"bytes {plan.start}-{plan.end}/{size}"
+            headers["Content-Length"] = str(plan.length)
+            media_type = "video/mp4"
+            stream = telegram_repository.get_video(
+                message_id, document_id, plan.start, plan.end, client_key
+            )
+        else:
+            plans = [plan_range(start, end, size) for start, end in ranges]
+            boundary = uuid4().hex
+            status_code = 206
+            headers["Content-Length"] = str(
+                sum(
+                    len(_multipart_part_header(plan, boundary, size)) + plan.length
+                    for plan in plans
+                )
+                + len(f"\r\n--{boundary}--\r\n")
+            )
+            media_type = f"multipart/byteranges; boundary={boundary}"
+            stream = _multipart_byteranges(
+                message_id, document_id, plans, boundary, size
             )
 
-        range_match = range_header.replace("bytes=", "").split("-")
-        start = int(range_match[0])
-        end = int(range_match[1]) if range_match[1] else size - 1
-        chunk_size = end - start + 1
+        if request.method == "HEAD":
+            return Response(
+                status_code=status_code, headers=headers, media_type=media_type
+            )
 
-        stream = telegram_repository.get_video(message_id, document_id, start, end)
         return StreamingResponse(
-            stream,
-            media_type="video/mp4",
-            status_code=206,
-            headers={
-                "Content-Range": f"bytes {start}-{end}/{size}",
-                "Content-Length": str(chunk_size),
-                "Accept-Ranges": "bytes",
-            },
+            stream, status_code=status_code, headers=headers, media_type=media_type
         )
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -117,53 +291,170 @@ async def search_posts(
     search: str = Query(None),
     per_page: int = Query(10),
     offset_id: int = Query(0),
+    cursor: str = Query(None),
 ):
     try:
-        pagination_data = PaginationData.from_parameters(
-            per_page=per_page, offset_id=offset_id, search=search
+        host = request.headers["host"]
+        protocol = request.url.scheme
+
+        async def render():
+            pagination_data = PaginationData.from_parameters(
+                per_page=per_page, offset_id=offset_id, search=search, cursor=cursor
+            )
+            data = await telegram_repository.paginate_with_search(pagination_data)
+
+            for post in data.data:
+                image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
+                video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+
+                post.image_url = image_url
+                post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+                post.video_url = video_url
+
+            return JSONResponse(jsonable_encoder(data)).body
+
+        body = await response_cache.get_or_set(
+            ("search", protocol, host, search, per_page, offset_id, cursor), render
         )
-        data = await telegram_repository.paginate_with_search(pagination_data)
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/posts/filter",
+    tags=["Post"],
+    operation_id="filter.posts",
+    response_model=FilteredPosts,
+)
+async def filter_posts(
+    request: Request,
+    genre: List[str] = Query(None),
+    language: List[str] = Query(None),
+    subtitle: List[str] = Query(None),
+    country: List[str] = Query(None),
+    year: List[str] = Query(None),
+    per_page: int = Query(10),
+    offset_id: int = Query(0),
+):
+    try:
+        host = request.headers["host"]
+        protocol = request.url.scheme
+
+        filters = {
+            "genre": genre,
+            "language": language,
+            "subtitle": subtitle,
+            "country": country,
+            "year": year,
+        }
+
+        async def render():
+            pagination_data = PaginationData.from_parameters(
+                per_page=per_page, offset_id=offset_id
+            )
+            data = await telegram_repository.filter_posts(filters, pagination_data)
+
+            for post in data.data:
+                image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
+                video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+
+                post.image_url = image_url
+                post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+                post.video_url = video_url
+
+            return JSONResponse(jsonable_encoder(data)).body
+
+        body = await response_cache.get_or_set(
+            (
+                "filter",
+                protocol,
+                host,
+                *(tuple(sorted(values or [])) for values in filters.values()),
+                per_page,
+                offset_id,
+            ),
+            render,
+        )
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get(
+    "/top/post",
+    tags=["Post"],
+    operation_id="get.top.post",
+    response_model=Post,
+)
+async def get_top_post(
+    request: Request,
+    window: TopWindow = Query(TopWindow.WEEK),
+):
+    try:
         host = request.headers["host"]
         protocol = request.url.scheme
 
-        for post in data.data:
+        async def render():
+            post = await telegram_repository.get_top_post(window)
+            if not post:
+                raise NotFoundException("Nenhum post encontrado.")
+
             image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
             video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
 
             post.image_url = image_url
+            post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
             post.video_url = video_url
 
-        json_data = jsonable_encoder(data)
-        return JSONResponse(json_data)
+            return JSONResponse(jsonable_encoder(post)).body
+
+        body = await response_cache.get_or_set(("top", protocol, host, window), render)
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get(
-    "/top/post",
+    "/top/posts",
     tags=["Post"],
-    operation_id="get.top.post",
-    response_model=Post,
+    operation_id="get.top.posts",
+    response_model=List[Post],
 )
-async def get_top_post(
+async def get_top_posts(
     request: Request,
+    window: TopWindow = Query(TopWindow.WEEK),
+    limit: int = Query(10, ge=1, le=100),
 ):
     try:
-        post = await telegram_repository.get_top_post()
-
         host = request.headers["host"]
         protocol = request.url.scheme
 
-        image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
-        video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
+        async def render():
+            posts = await telegram_repository.get_top_posts(window, limit)
+
+            for post in posts:
+                image_url = f"{protocol}://{host}/api/v1/posts/images/{post.message_id}"
+                video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={post.document_id}&size={post.document_size}&message_id={post.message_document_id}"
 
-        post.image_url = image_url
-        post.video_url = video_url
+                post.image_url = image_url
+                post.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+                post.video_url = video_url
 
-        if not post:
-            raise HTTPException(status_code=404, detail="Nenhum post encontrado.")
-        return post
+            return JSONResponse(jsonable_encoder(posts)).body
+
+        body = await response_cache.get_or_set(
+            ("top", protocol, host, window, limit), render
+        )
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -173,18 +464,26 @@ async def get_top_post(
 )
 async def get(request: Request, message_id: int):
     try:
-        data = await telegram_repository.get_post(message_id)
-
         host = request.headers["host"]
         protocol = request.url.scheme
 
-        image_url = f"{protocol}://{host}/api/v1/posts/images/{data.message_id}"
-        video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={data.document_id}&size={data.document_size}&message_id={data.message_document_id}"
+        async def render():
+            data = await telegram_repository.get_post(message_id)
 
-        data.image_url = image_url
-        data.video_url = video_url
+            image_url = f"{protocol}://{host}/api/v1/posts/images/{data.message_id}"
+            video_url = f"{protocol}://{host}/api/v1/posts/stream?document_id={data.document_id}&size={data.document_size}&message_id={data.message_document_id}"
 
-        json_data = jsonable_encoder(data)
-        return JSONResponse(json_data)
+            data.image_url = image_url
+            data.thumbnail_url = f"{image_url}?size={ImageSize.THUMB.value}"
+            data.video_url = video_url
+
+            return JSONResponse(jsonable_encoder(data)).body
+
+        body = await response_cache.get_or_set(
+            ("post", protocol, host, message_id), render
+        )
+        return Response(body, media_type="application/json")
+    except CustomException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,676 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from telethon.tl.types import Message
+
+from app.schemas import (
+    FacetCount,
+    FilteredPosts,
+    PaginatedPosts,
+    PaginationData,
+    Post,
+    TopWindow,
+)
+from core import logger
+from core.cache import parse_cache
+from core.exceptions import BadRequestException
+from core.utils import (
+    ReactionRanking,
+    decode_cursor,
+    encode_cursor,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    grouped_id INTEGER NOT NULL,
+    date TEXT,
+    author TEXT,
+    text TEXT,
+    reactions TEXT NOT NULL DEFAULT '[]',
+    has_media INTEGER NOT NULL DEFAULT 0,
+    document_id INTEGER,
+    document_size INTEGER,
+    document_mime_type TEXT,
+    document_dc_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_grouped_id ON messages (grouped_id);
+
+CREATE TABLE IF NOT EXISTS posts (
+    message_id INTEGER PRIMARY KEY,
+    grouped_id INTEGER NOT NULL UNIQUE,
+    date TEXT,
+    author TEXT,
+    reactions TEXT NOT NULL,
+    reaction_count INTEGER NOT NULL,
+    original_content TEXT NOT NULL,
+    parsed_content TEXT NOT NULL,
+    document_id INTEGER,
+    document_size INTEGER,
+    message_document_id INTEGER
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5 (
+    title, people, terms, body,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+
+CREATE TABLE IF NOT EXISTS post_facets (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    label TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (facet, value, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS post_facets_message_id ON post_facets (message_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Facet name -> parsed_content field it is read from
+FACETS = {
+    "genre": "genres",
+    "language": "languages",
+    "subtitle": "subtitles",
+    "country": "country_of_origin",
+    "year": "release_date",
+}
+
+# Length in seconds of each top posts window
+TOP_WINDOWS = {
+    TopWindow.TODAY.value: 24 * 3600,
+    TopWindow.WEEK.value: 7 * 24 * 3600,
+    TopWindow.ALL.value: None,
+}
+
+# Relevance weight of each posts_fts column: title, people, terms, body
+SEARCH_WEIGHTS = (10.0, 4.0, 3.0, 1.0)
+
+POST_COLUMNS = (
+    "message_id, grouped_id, date, author, reactions, original_content, "
+    "parsed_content, document_id, document_size, message_document_id"
+)
+
+
+def _reactions(reactions) -> list:
+    if not reactions:
+        return []
+    return [
+        {"reaction": result.reaction.emoticon, "count": result.count}
+        for result in reactions.results
+        if hasattr(result.reaction, "emoticon")
+    ]
+
+
+def _search_document(original_content: str, parsed_content: dict) -> tuple:
+    """
+    Splits a post into the columns of posts_fts.
+    """
+    people = (
+        parsed_content["directors"] + parsed_content["writers"] + parsed_content["cast"]
+    )
+    terms = (
+        parsed_content["genres"]
+        + parsed_content["tags"]
+        + parsed_content["country_of_origin"]
+        + parsed_content["languages"]
+        + parsed_content["subtitles"]
+        + [parsed_content["release_date"] or ""]
+    )
+    return (
+        parsed_content["title"] or "",
+        " ".join(people),
+        " ".join(terms),
+        original_content,
+    )
+
+
+def facet_key(value: str) -> str:
+    """
+    Normalizes a facet value so filters ignore case and accents.
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    return (
+        "".join(c for c in decomposed if not unicodedata.combining(c))
+        .casefold()
+        .strip()
+    )
+
+
+def _facet_values(parsed_content: dict) -> List[tuple]:
+    rows = []
+    for facet, field in FACETS.items():
+        values = parsed_content[field]
+        if not isinstance(values, list):
+            values = [values] if values else []
+        for label in values:
+            key = facet_key(label)
+            if key:
+                rows.append((facet, key, label.strip()))
+    return rows
+
+
+def _timestamp(date: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(date).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _match_query(search: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query where every word must match as a
+    prefix. Accents and case are folded by the tokenizer.
+    """
+    words = re.findall(r"\w+", search or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class PostIndex:
+    def __init__(self, path: str):
+        """
+        Initializes the PostIndex.
+
+        Keeps a SQLite copy of the grouped posts of the channel: every album
+        message is stored as it arrives and its album is rebuilt into a post
+        row (info message, media message, document metadata and parsed
+        content), so listings are answered locally instead of walking the
+        channel history. The index is only served once ``backfilled`` is set,
+        which is read from the database once and kept in memory.
+
+        :param path: Path of the SQLite database ("" disables the index).
+        """
+        logger.info(f"Initializing post index at {path or 'disabled'}")
+        self.path = path
+        self.lock = threading.Lock()
+        self.db: Optional[sqlite3.Connection] = None
+        self.ranking = ReactionRanking(TOP_WINDOWS)
+        self.backfilled = False
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            self._fill_derived_indexes()
+            self._load_ranking()
+            self.backfilled = self.get_meta("backfilled", False)
+
+    def _load_ranking(self):
+        with self.lock:
+            for row in self.db.execute(
+                "SELECT message_id, date, reaction_count FROM posts"
+            ):
+                self.ranking.update(
+                    row["message_id"], _timestamp(row["date"]), row["reaction_count"]
+                )
+
+    def _fill_derived_indexes(self):
+        """
+        Indexes the posts that are missing from posts_fts and post_facets,
+        such as the ones stored before those indexes existed.
+        """
+        facets_built = self.get_meta("facets_built", False)
+        with self.lock, self.db:
+            rows = self.db.execute(
+                "SELECT message_id, original_content, parsed_content FROM posts "
+                "WHERE message_id NOT IN (SELECT rowid FROM posts_fts)"
+            ).fetchall()
+            for row in rows:
+                self._index_search(
+                    row["message_id"],
+                    row["original_content"],
+                    json.loads(row["parsed_content"]),
+                )
+
+            if not facets_built:
+                self.db.execute("DELETE FROM post_facets")
+                for row in self.db.execute(
+                    "SELECT message_id, parsed_content FROM posts"
+                ).fetchall():
+                    self._index_facets(
+                        row["message_id"], json.loads(row["parsed_content"])
+                    )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) "
+                    "VALUES ('facets_built', 'true')"
+                )
+
+    @property
+    def enabled(self) -> bool:
+        return self.db is not None
+
+    def get_meta(self, key: str, default=None):
+        if not self.enabled:
+            return default
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key: str, value):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def set_backfilled(self):
+        self.set_meta("backfilled", True)
+        self.backfilled = True
+
+    @property
+    def ready(self) -> bool:
+        return self.backfilled
+
+    def max_message_id(self) -> int:
+        with self.lock:
+            row = self.db.execute("SELECT MAX(id) AS id FROM messages").fetchone()
+        return row["id"] or 0
+
+    def upsert_messages(self, messages: Iterable[Message]):
+        """
+        Stores album messages and rebuilds the posts of their albums.
+        Messages that aren't part of an album are not listed, so they're skipped.
+        """
+        rows = []
+        for message in messages:
+            if not isinstance(message, Message) or not message.grouped_id:
+                continue
+            document = getattr(message.media, "document", None)
+            rows.append(
+                (
+                    message.id,
+                    message.grouped_id,
+                    (
+                        message.date.isoformat()
+                        if isinstance(message.date, datetime)
+                        else message.date
+                    ),
+                    message.post_author,
+                    message.message,
+                    json.dumps(_reactions(message.reactions)),
+                    int(message.media is not None),
+                    getattr(document, "id", None),
+                    getattr(document, "size", None),
+                    getattr(document, "mime_type", None),
+                    getattr(document, "dc_id", None),
+                )
+            )
+        if not rows:
+            return
+
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO messages (id, grouped_id, date, author, "
+                "text, reactions, has_media, document_id, document_size, "
+                "document_mime_type, document_dc_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            for grouped_id in {row[1] for row in rows}:
+                self._rebuild_post(grouped_id)
+
+    def update_reactions(self, reactions: Dict[int, object]) -> int:
+        """
+        Stores fresh reaction counts and rebuilds the posts they belong to.
+        :param reactions: Mapping of message ID to its MessageReactions.
+        :return: The number of messages whose counts changed.
+        """
+        changed = 0
+        with self.lock, self.db:
+            grouped_ids = set()
+            for message_id, message_reactions in reactions.items():
+                value = json.dumps(_reactions(message_reactions))
+                row = self.db.execute(
+                    "SELECT grouped_id, reactions FROM messages WHERE id = ?",
+                    (message_id,),
+                ).fetchone()
+                if row is None or row["reactions"] == value:
+                    continue
+                self.db.execute(
+                    "UPDATE messages SET reactions = ? WHERE id = ?",
+                    (value, message_id),
+                )
+                grouped_ids.add(row["grouped_id"])
+                changed += 1
+            for grouped_id in grouped_ids:
+                self._rebuild_post(grouped_id)
+        return changed
+
+    def refresh_candidates(self, recent: int, top: int) -> List[int]:
+        """
+        Returns the IDs of the latest ``recent`` posts and of the ``top`` most
+        reacted posts of the week and of all time.
+        """
+        with self.lock:
+            message_ids = [
+                row["message_id"]
+                for row in self.db.execute(
+                    "SELECT message_id FROM posts ORDER BY message_id DESC LIMIT ?",
+                    (recent,),
+                )
+            ]
+            message_ids += self.ranking.top(TopWindow.WEEK.value, top)
+            message_ids += self.ranking.top(TopWindow.ALL.value, top)
+        return list(dict.fromkeys(message_ids))
+
+    def delete_messages(self, message_ids: Iterable[int]):
+        message_ids = list(message_ids)
+        if not message_ids:
+            return
+
+        placeholders = ",".join("?" * len(message_ids))
+        with self.lock, self.db:
+            grouped_ids = [
+                row["grouped_id"]
+                for row in self.db.execute(
+                    f"SELECT DISTINCT grouped_id FROM messages "
+                    f"WHERE id IN ({placeholders})",
+                    message_ids,
+                )
+            ]
+            self.db.execute(
+                f"DELETE FROM messages WHERE id IN ({placeholders})", message_ids
+            )
+            for grouped_id in grouped_ids:
+                self._rebuild_post(grouped_id)
+
+    def _rebuild_post(self, grouped_id: int):
+        """
+        Rebuilds the post of an album from its stored messages. Must be called
+        inside a transaction with the lock held.
+        """
+        messages = self.db.execute(
+            "SELECT * FROM messages WHERE grouped_id = ? ORDER BY id DESC",
+            (grouped_id,),
+        ).fetchall()
+        info = next((msg for msg in messages if msg["text"]), None)
+        has_media = any(msg["has_media"] for msg in messages)
+        media = next((msg for msg in messages if msg["document_id"]), None)
+
+        old = self.db.execute(
+            "SELECT message_id FROM posts WHERE grouped_id = ?", (grouped_id,)
+        ).fetchone()
+        if old is not None:
+            self.db.execute("DELETE FROM posts_fts WHERE rowid = ?", (old[0],))
+            self.db.execute("DELETE FROM post_facets WHERE message_id = ?", (old[0],))
+            # update() replaces a post that stays, keeping its expiry entries
+            if info is None or not has_media or old[0] != info["id"]:
+                self.ranking.remove(old[0])
+        self.db.execute("DELETE FROM posts WHERE grouped_id = ?", (grouped_id,))
+        if info is None or not has_media:
+            return
+
+        reactions = json.loads(info["reactions"])
+        parsed_content = parse_cache.parse(info["id"], info["text"])
+        self.db.execute(
+            f"INSERT OR REPLACE INTO posts ({POST_COLUMNS}, reaction_count) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                info["id"],
+                grouped_id,
+                info["date"],
+                info["author"],
+                info["reactions"],
+                info["text"],
+                json.dumps(parsed_content),
+                media["document_id"] if media else None,
+                media["document_size"] if media else None,
+                media["id"] if media else None,
+                sum(reaction["count"] for reaction in reactions),
+            ),
+        )
+        self._index_search(info["id"], info["text"], parsed_content)
+        self._index_facets(info["id"], parsed_content)
+        self.ranking.update(
+            info["id"],
+            _timestamp(info["date"]),
+            sum(reaction["count"] for reaction in reactions),
+        )
+
+    def _index_search(self, message_id: int, original_content: str, parsed_content):
+        self.db.execute(
+            "INSERT INTO posts_fts (rowid, title, people, terms, body) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (message_id, *_search_document(original_content, parsed_content)),
+        )
+
+    def _index_facets(self, message_id: int, parsed_content):
+        self.db.executemany(
+            "INSERT OR IGNORE INTO post_facets (facet, value, label, message_id) "
+            "VALUES (?, ?, ?, ?)",
+            [(*row, message_id) for row in _facet_values(parsed_content)],
+        )
+
+    @staticmethod
+    def _to_post(row: sqlite3.Row) -> Post:
+        return Post(
+            image_url="",
+            video_url="",
+            grouped_id=row["grouped_id"],
+            message_id=row["message_id"],
+            date=row["date"],
+            author=row["author"],
+            reactions=json.loads(row["reactions"]),
+            original_content=row["original_content"],
+            parsed_content=json.loads(row["parsed_content"]),
+            document_id=row["document_id"],
+            document_size=row["document_size"],
+            message_document_id=row["message_document_id"],
+        )
+
+    def paginate(self, pagination: PaginationData) -> PaginatedPosts:
+        offset_id = pagination.offset_id
+        if pagination.cursor:
+            cursor = decode_cursor(pagination.cursor)
+            if not isinstance(cursor.get("offset_id"), int):
+                raise BadRequestException("Invalid cursor")
+            offset_id = cursor["offset_id"]
+
+        query = f"SELECT {POST_COLUMNS} FROM posts"
+        params = []
+        if offset_id:
+            query += " WHERE message_id < ?"
+            params.append(offset_id)
+        query += " ORDER BY message_id DESC LIMIT ?"
+        params.append(pagination.per_page)
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        posts = [self._to_post(row) for row in rows]
+
+        pagination.next_cursor = None
+        if len(posts) == pagination.per_page:
+            pagination.next_cursor = encode_cursor({"offset_id": posts[-1].message_id})
+
+        if posts:
+            pagination.first_offset_id = posts[0].message_id
+            pagination.last_offset_id = posts[-1].message_id
+            pagination.total = len(posts)
+
+        return PaginatedPosts(data=posts, pagination=pagination)
+
+    def search(self, pagination: PaginationData) -> PaginatedPosts:
+        """
+        Returns a page of the posts matching ``pagination.search``, most
+        relevant first. The cursor holds the ID and score of the last post
+        returned, so following pages continue after it even when posts are
+        added in between.
+        """
+        match = _match_query(pagination.search)
+        if match is None:
+            return self.paginate(pagination)
+
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        results = (
+            f"SELECT rowid, bm25(posts_fts, {weights}) AS score "
+            f"FROM posts_fts WHERE posts_fts MATCH ?"
+        )
+        query = (
+            f"SELECT {POST_COLUMNS}, score FROM posts "
+            f"JOIN ({results}) AS results ON results.rowid = posts.message_id"
+        )
+        params = [match]
+        cursor = self._search_cursor(pagination)
+
+        with self.lock:
+            if cursor is not None:
+                # Scores move as posts are added, so the page continues from
+                # the current score of the last post seen when it still matches
+                anchor = self.db.execute(
+                    f"SELECT score FROM ({results}) WHERE rowid = ?",
+                    (match, cursor["message_id"]),
+                ).fetchone()
+                score = anchor["score"] if anchor else cursor["score"]
+                query += " WHERE score > ? OR (score = ? AND message_id < ?)"
+                params += [score, score, cursor["message_id"]]
+            query += " ORDER BY score, message_id DESC LIMIT ?"
+            params.append(pagination.per_page)
+            rows = self.db.execute(query, params).fetchall()
+        posts = [self._to_post(row) for row in rows]
+
+        if len(rows) == pagination.per_page:
+            pagination.next_cursor = encode_cursor(
+                {
+                    "search": pagination.search,
+                    "score": rows[-1]["score"],
+                    "message_id": rows[-1]["message_id"],
+                }
+            )
+
+        if posts:
+            pagination.first_offset_id = posts[0].message_id
+            pagination.last_offset_id = posts[-1].message_id
+            pagination.total = len(posts)
+
+        return PaginatedPosts(data=posts, pagination=pagination)
+
+    def filter(
+        self, filters: Dict[str, List[str]], pagination: PaginationData
+    ) -> FilteredPosts:
+        """
+        Returns a page of the posts that match the facet filters, newest
+        first, and the number of posts for each facet value. Values of one
+        facet are OR-ed and different facets are AND-ed. The counts of a
+        facet are taken over the posts matching the filters of the other
+        facets, so they show how many posts each alternative value would give.
+        :param filters: Mapping of facet name to the accepted values.
+        :param pagination: Page size and offset_id.
+        """
+        filters = {
+            facet: keys
+            for facet, values in filters.items()
+            if facet in FACETS
+            and (keys := [facet_key(value) for value in values or [] if value.strip()])
+        }
+
+        def matching(exclude: Optional[str] = None):
+            clauses, params = [], []
+            for facet, keys in filters.items():
+                if facet == exclude:
+                    continue
+                clauses.append(
+                    f"message_id IN (SELECT message_id FROM post_facets "
+                    f"WHERE facet = ? AND value IN ({','.join('?' * len(keys))}))"
+                )
+                params += [facet, *keys]
+            return clauses, params
+
+        clauses, params = matching()
+        if pagination.offset_id:
+            clauses.append("message_id < ?")
+            params.append(pagination.offset_id)
+        query = f"SELECT {POST_COLUMNS} FROM posts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY message_id DESC LIMIT ?"
+        params.append(pagination.per_page)
+
+        facets = {}
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+            for facet in FACETS:
+                clauses, count_params = matching(exclude=facet)
+                count_query = (
+                    "SELECT MIN(label) AS label, COUNT(*) AS count FROM post_facets "
+                    "WHERE facet = ?"
+                )
+                for clause in clauses:
+                    count_query += f" AND {clause}"
+                count_query += " GROUP BY value ORDER BY count DESC, label"
+                facets[facet] = [
+                    FacetCount(value=row["label"], count=row["count"])
+                    for row in self.db.execute(count_query, [facet, *count_params])
+                ]
+
+        posts = [self._to_post(row) for row in rows]
+        if posts:
+            pagination.first_offset_id = posts[0].message_id
+            pagination.last_offset_id = posts[-1].message_id
+            pagination.total = len(posts)
+
+        return FilteredPosts(data=posts, pagination=pagination, facets=facets)
+
+    @staticmethod
+    def _search_cursor(pagination: PaginationData) -> Optional[dict]:
+        if not pagination.cursor:
+            return None
+        cursor = decode_cursor(pagination.cursor)
+        if cursor.get("search") != pagination.search:
+            raise BadRequestException("Cursor belongs to another search")
+        if not isinstance(cursor.get("score"), (int, float)) or not isinstance(
+            cursor.get("message_id"), int
+        ):
+            raise BadRequestException("Invalid cursor")
+        return cursor
+
+    def get_post(self, message_id: int) -> Optional[Post]:
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT {POST_COLUMNS} FROM posts WHERE message_id = ?",
+                (message_id,),
+            ).fetchone()
+        return self._to_post(row) if row else None
+
+    def get_posts(self, message_ids: List[int]) -> List[Post]:
+        """
+        Returns the indexed posts among message_ids, in the given order.
+        """
+        if not message_ids:
+            return []
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {POST_COLUMNS} FROM posts "
+                f"WHERE message_id IN ({','.join('?' * len(message_ids))})",
+                message_ids,
+            ).fetchall()
+        posts = {row["message_id"]: self._to_post(row) for row in rows}
+        return [posts[message_id] for message_id in message_ids if message_id in posts]
+
+    def get_top_posts(self, window: TopWindow, count: int) -> List[Post]:
+        """
+        Returns the ``count`` posts with the most reactions published in a window.
+        """
+        with self.lock:
+            message_ids = self.ranking.top(window.value, count)
+        return self.get_posts(message_ids)
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
+            self.db = None
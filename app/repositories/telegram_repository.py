@@ -1,36 +1,388 @@
+import asyncio
+import collections
+import math
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import uuid4
 
-from telethon.tl.functions.messages import GetHistoryRequest
-from telethon.tl.types import Message
+from telethon import utils
+from telethon.errors import (
+    FileMigrateError,
+    FileReferenceExpiredError,
+    FilerefUpgradeNeededError,
+)
+from telethon.tl.functions.messages import (
+    GetHistoryRequest,
+    GetMessagesReactionsRequest,
+)
+from telethon.tl.functions.upload import GetFileRequest
+from telethon.tl.types import (
+    InputPhotoFileLocation,
+    Message,
+    PhotoSize,
+    PhotoSizeProgressive,
+    UpdateMessageReactions,
+)
+from telethon.tl.types.upload import File
 
-from app.schemas import PaginationData, Post, PaginatedPosts
-from core import logger
-from core.cache import cache
-from core.integrations import TelegramClientWrapper
+from app.schemas import (
+    FilteredPosts,
+    ImageSize,
+    PaginationData,
+    Post,
+    PaginatedPosts,
+    TopWindow,
+    WarmUpLevel,
+)
+from core import config, logger
+from core.exceptions import BadRequestException, ServiceUnavailableException
+from core.cache import (
+    CHUNK_SIZE,
+    CacheManager,
+    cache,
+    chunk_store,
+    image_store,
+    load_snapshot,
+    pack_tl,
+    parse_cache,
+    response_cache,
+    save_snapshot,
+    unpack_tl,
+)
+from core.integrations import (
+    BackgroundPrefetcher,
+    ClientPool,
+    MessageLoader,
+    ParallelDownloader,
+    Prefetcher,
+    Priority,
+    ReactionRefresher,
+    TelegramClientWrapper,
+    rpc_context,
+    rpc_priority,
+)
+from core.utils import (
+    BulkParser,
+    SingleFlight,
+    decode_cursor,
+    encode_cursor,
+    plan_range,
+)
+from .post_index import TOP_WINDOWS, PostIndex
+
+# Maximum number of messages GetHistoryRequest returns at once
+HISTORY_BATCH_LIMIT = 100
+# Weight of the latest page in the messages-per-album estimate
+HISTORY_RATIO_SMOOTHING = 0.3
+
+# Minimum width of the photo variant served for each image size
+IMAGE_WIDTHS = {ImageSize.THUMB: 320, ImageSize.MEDIUM: 800, ImageSize.FULL: None}
 
 
 @dataclass
 class TelegramRepository:
-    client: TelegramClientWrapper = field(default_factory=TelegramClientWrapper)
+    clients: ClientPool = field(default_factory=ClientPool.from_sessions)
     channel_id: int = field(init=False)
-    channel: Optional[Any] = None
+    downloader: ParallelDownloader = field(
+        default_factory=lambda: ParallelDownloader(
+            concurrency=config.STREAM_CONCURRENCY,
+            buffer_size=config.STREAM_BUFFER_CHUNKS,
+        )
+    )
+    prefetcher: Prefetcher = field(
+        default_factory=lambda: Prefetcher(
+            read_ahead=config.PREFETCH_CHUNKS, ttl=config.PREFETCH_SESSION_TTL
+        )
+    )
+    chunk_flights: SingleFlight = field(default_factory=SingleFlight)
+    # Coalesced get_messages lookups, per client name (None for the whole pool)
+    # and priority class, since a batch runs at the priority of its first lookup
+    message_loaders: Dict[Tuple[Optional[str], Priority], MessageLoader] = field(
+        default_factory=dict
+    )
+    image_flights: SingleFlight = field(default_factory=SingleFlight)
+    # Messages fetched past the end of a page, by cursor buffer token
+    page_buffers: CacheManager = field(
+        default_factory=lambda: CacheManager(max_size=1000, ttl=600)
+    )
+    image_prefetcher: BackgroundPrefetcher = field(
+        default_factory=lambda: BackgroundPrefetcher(
+            concurrency=config.IMAGE_PREFETCH_CONCURRENCY
+        )
+    )
+    index: PostIndex = field(default_factory=lambda: PostIndex(config.POST_INDEX_PATH))
+    reaction_refresher: ReactionRefresher = field(init=False)
+    bulk_parser: BulkParser = field(
+        default_factory=lambda: BulkParser(workers=config.PARSE_WORKERS)
+    )
+    # Observed number of history messages per album, used to size batches
+    messages_per_group: float = field(default=3.0, init=False)
+    warm_up_level: WarmUpLevel = field(default=WarmUpLevel.STARTING, init=False)
+    _warm_up_task: Optional[asyncio.Task] = field(default=None, init=False)
+    _index_task: Optional[asyncio.Task] = field(default=None, init=False)
 
     def __post_init__(self):
-        self.channel_id = self.client.channel_id
+        self.channel_id = self.clients.primary.channel_id
+        self.reaction_refresher = ReactionRefresher(
+            select=self._reaction_candidates,
+            fetch=self._get_reactions,
+            apply=self._apply_reactions,
+            min_interval=config.REACTIONS_REFRESH_MIN_INTERVAL,
+            max_interval=config.REACTIONS_REFRESH_MAX_INTERVAL,
+        )
+
+    @property
+    def client(self) -> TelegramClientWrapper:
+        return self.clients.primary
+
+    @property
+    def channel(self) -> Optional[Any]:
+        return self.clients.primary.channel
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether warm-up reached the level configured to take traffic.
+        """
+        required = WarmUpLevel[config.WARM_UP_LEVEL.upper()]
+        return self.warm_up_level >= required
 
     async def start_client(self):
-        if not self.client.is_connected():
-            await self.client.connect()
-        await self.client.start()
-        logger.info("Connected to Telegram")
-        self.channel = await self.client.get_entity(self.channel_id)
+        restored = await asyncio.to_thread(self._restore_snapshot)
+        await self.clients.start()
+        self.warm_up_level = WarmUpLevel.CONNECTED
+        self._warm_up_task = asyncio.create_task(self._warm_up(restored))
+        self.client.watch_channel(self._index_messages, self._unindex_messages)
+        if self.index.enabled:
+            self._index_task = asyncio.create_task(self._sync_index())
+            self.reaction_refresher.start()
 
     async def stop_client(self):
-        await self.client.disconnect()
+        if self._warm_up_task:
+            self._warm_up_task.cancel()
+        if self._index_task:
+            self._index_task.cancel()
+        await self.reaction_refresher.stop()
+        await self.image_prefetcher.close()
+        self.bulk_parser.close()
+        try:
+            await asyncio.to_thread(self._save_snapshot)
+        except Exception as e:
+            logger.warning(f"Failed to save snapshot: {e}")
+        await self.clients.stop()
+        self.index.close()
         logger.info("Disconnected from Telegram")
 
+    def _save_snapshot(self):
+        """
+        Saves what is expensive to rebuild after a restart: the channel entity
+        of each account, the DCs the videos live on, the history shape and the
+        rendered responses. Documents are left out, since their file
+        references would be restored as fresh although they may have expired.
+        """
+        save_snapshot(
+            config.SNAPSHOT_PATH,
+            {
+                "channels": {
+                    client.session_key: pack_tl(client.channel)
+                    for client in self.clients.clients
+                    if client.channel is not None
+                },
+                "dc_counts": dict(self.client.sender_pool.dc_counts),
+                "messages_per_group": self.messages_per_group,
+                "responses": response_cache.dump(),
+            },
+        )
+
+    def _restore_snapshot(self) -> List[TelegramClientWrapper]:
+        """
+        Restores the state saved by _save_snapshot. Returns the clients whose
+        channel entity was restored, to be refreshed once connected.
+        """
+        state = load_snapshot(config.SNAPSHOT_PATH)
+        if not state:
+            return []
+
+        restored = []
+        try:
+            for client in self.clients.clients:
+                channel = state["channels"].get(client.session_key)
+                if channel is not None:
+                    client.channel = unpack_tl(channel)
+                    restored.append(client)
+                client.sender_pool.dc_counts.update(state["dc_counts"])
+            self.messages_per_group = state["messages_per_group"]
+            response_cache.restore(state["responses"])
+            logger.info(
+                f"Restored snapshot saved at {datetime.fromtimestamp(state['saved_at'])}"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to restore snapshot: {e}")
+        return restored
+
+    async def _warm_up(self, restored: List[TelegramClientWrapper]):
+        """
+        Refreshes the restored channel entities and opens the senders streams
+        will need, then marks the server warm.
+        """
+        with rpc_context(Priority.BACKGROUND):
+            for client in restored:
+                try:
+                    client.channel = await client.get_entity(client.channel_id)
+                except Exception as e:
+                    logger.warning(f"Failed to refresh channel of {client.name}: {e}")
+            await self._warm_up_senders()
+        self.warm_up_level = WarmUpLevel.WARM
+        logger.info("Warm-up finished")
+
+    async def _warm_up_senders(self):
+        """
+        Opens pooled senders for the DCs that host most of the recent videos,
+        as seen before the restart or in the latest history.
+        """
+        try:
+            dc_counts = collections.Counter(self.client.sender_pool.dc_counts)
+            if not dc_counts:
+                history = await self._get_history(limit=100)
+                for message in history:
+                    document = getattr(message.media, "document", None)
+                    if document is not None:
+                        dc_counts[document.dc_id] += 1
+                for client in self.clients.available():
+                    client.sender_pool.dc_counts.update(dc_counts)
+
+            dc_ids = [dc_id for dc_id, _ in dc_counts.most_common()]
+            for client in self.clients.available():
+                await client.sender_pool.warm_up(dc_ids[: config.SENDER_POOL_WARM_DCS])
+        except Exception as e:
+            logger.warning(f"Failed to warm up senders: {e}")
+
+    async def _sync_index(self):
+        """
+        Brings the post index up to date: first the messages posted while the
+        process was down, then the rest of the channel history if the
+        backfill hasn't finished yet. Updates keep it current afterwards.
+        """
+        try:
+            with rpc_context(Priority.BACKGROUND):
+                newest = await asyncio.to_thread(self.index.max_message_id)
+                if newest:
+                    await self._index_history(min_id=newest)
+
+                if not self.index.ready:
+                    offset_id = await asyncio.to_thread(
+                        self.index.get_meta, "backfill_offset", 0
+                    )
+                    await self._index_history(offset_id=offset_id, checkpoint=True)
+                    await asyncio.to_thread(self.index.set_backfilled)
+                    response_cache.invalidate()
+                    logger.info("Post index backfilled")
+        except Exception as e:
+            logger.warning(f"Failed to sync post index: {e}")
+
+    async def _index_history(self, offset_id=0, min_id=0, checkpoint=False):
+        """
+        Indexes the channel history below ``offset_id`` (and above ``min_id``)
+        page by page. Album captions are streamed to the bulk parser while the
+        next pages are fetched, so several pages are parsed at once, and each
+        page is stored once its captions are in the parse cache.
+        """
+        pages = collections.deque()  # (history, captions not parsed yet)
+
+        async def store_parsed_pages():
+            while pages and not pages[0][1]:
+                history, _ = pages.popleft()
+                await asyncio.to_thread(self.index.upsert_messages, history)
+                if min_id:  # Catching up on new posts changes what listings return
+                    response_cache.invalidate()
+                if checkpoint:
+                    await asyncio.to_thread(
+                        self.index.set_meta,
+                        "backfill_offset",
+                        min(msg.id for msg in history),
+                    )
+
+        async def captions():
+            offset = offset_id
+            while True:
+                await store_parsed_pages()
+                history = await self._get_history(
+                    limit=100, offset_id=offset, min_id=min_id, cache_documents=False
+                )
+                if not history:
+                    return
+                offset = min(msg.id for msg in history)
+                messages = collections.deque(
+                    msg
+                    for msg in history
+                    if parse_cache.max_entries
+                    and isinstance(msg, Message)
+                    and msg.grouped_id
+                    and msg.message
+                )
+                pages.append((history, messages))
+                for message in list(messages):
+                    yield message.message
+
+        async for data in self.bulk_parser.parse_many(captions()):
+            message = pages[0][1].popleft()
+            parse_cache.set(message.id, message.message, data.to_dict())
+            await store_parsed_pages()
+        await store_parsed_pages()
+
+    async def _index_messages(self, messages: List[Message]):
+        self._cache_documents(self.client, messages)
+        for message in messages:  # Edits must be parsed again
+            parse_cache.invalidate(message.id)
+        # An edit may replace the photo of a post
+        await asyncio.to_thread(image_store.unlink, [msg.id for msg in messages])
+        if self.index.enabled:
+            await asyncio.to_thread(self.index.upsert_messages, messages)
+        response_cache.invalidate()
+
+    async def _unindex_messages(self, message_ids: List[int]):
+        for message_id in message_ids:
+            parse_cache.invalidate(message_id)
+        await asyncio.to_thread(image_store.unlink, message_ids)
+        if self.index.enabled:
+            await asyncio.to_thread(self.index.delete_messages, message_ids)
+        response_cache.invalidate()
+
+    async def _reaction_candidates(self) -> List[int]:
+        if not self.index.ready:
+            return []
+        return await asyncio.to_thread(
+            self.index.refresh_candidates,
+            config.REACTIONS_REFRESH_RECENT,
+            config.REACTIONS_REFRESH_TOP,
+        )
+
+    async def _get_reactions(self, message_ids: List[int]) -> Dict[int, Any]:
+        """
+        Fetches the current reactions of up to 100 messages in one request.
+        """
+
+        async def get_reactions(client: TelegramClientWrapper):
+            return await client(
+                GetMessagesReactionsRequest(peer=client.channel, id=message_ids)
+            )
+
+        updates = await self.clients.run(get_reactions)
+        return {
+            update.msg_id: update.reactions
+            for update in getattr(updates, "updates", [])
+            if isinstance(update, UpdateMessageReactions)
+        }
+
+    async def _apply_reactions(self, reactions: Dict[int, Any]) -> int:
+        changed = await asyncio.to_thread(self.index.update_reactions, reactions)
+        if changed:
+            response_cache.invalidate()
+        return changed
+
     async def _get_history(
         self,
         limit: int = 10,
@@ -39,58 +391,176 @@ class TelegramRepository:
         add_offset: int = 0,
         max_id: int = 0,
         min_id: int = 0,
+        cache_documents: bool = True,
     ) -> List[Message]:
-        history = await self.client(
-            GetHistoryRequest(
-                peer=self.channel,
-                limit=limit,
-                offset_id=offset_id,
-                offset_date=offset_date,
-                add_offset=add_offset,
-                max_id=max_id,
-                min_id=min_id,
-                hash=self.channel.access_hash,
+        async def get_history(client: TelegramClientWrapper):
+            history = await client(
+                GetHistoryRequest(
+                    peer=client.channel,
+                    limit=limit,
+                    offset_id=offset_id,
+                    offset_date=offset_date,
+                    add_offset=add_offset,
+                    max_id=max_id,
+                    min_id=min_id,
+                    hash=client.channel.access_hash,
+                )
             )
-        )
-        return history.messages
+            if cache_documents:
+                self._cache_documents(client, history.messages)
+            return history.messages
+
+        return await self.clients.run(get_history)
+
+    @staticmethod
+    def _cache_documents(client: TelegramClientWrapper, messages: List[Message]):
+        for message in messages:
+            document = getattr(getattr(message, "media", None), "document", None)
+            if document is not None:
+                cache.set((client.name, document.id), document)
 
     async def _grouped_posts(
         self, pagination: PaginationData
     ) -> Dict[str, List[Message]]:
-        limit = pagination.per_page
-        offset_id = pagination.offset_id
-        total_messages_needed = limit
-        grouped_messages = {}
+        """
+        Returns the next ``per_page`` complete albums of the channel history.
 
-        while len(grouped_messages) < total_messages_needed:
-            current_limit = max(10, limit * 2)
+        An album is only returned once a message older than it has been seen
+        (or the history has ended), so albums are never split across pages.
+        Messages fetched past the page are kept in ``page_buffers`` and the
+        cursor set in ``pagination.next_cursor`` points at them, so the next
+        page starts with them instead of fetching them again.
+        """
+        limit = pagination.per_page
+        cursor = self._page_cursor(pagination)
+        buffer: List[Message] = []
+        if cursor.get("buffer"):
+            # Copied: the same cursor can be read again, by a retry or a prefetch
+            buffer = list(self.page_buffers.get(cursor["buffer"]) or [])
+        offset_id = cursor["history_offset"] if buffer else cursor["offset_id"]
+        exhausted = False
 
-            history = await self._get_history(current_limit, offset_id)
-            messages = [
-                message
-                for message in history
-                if hasattr(message, "grouped_id") and message.grouped_id
-            ]
+        while True:
+            grouped_messages = {}
+            for message in buffer:
+                if getattr(message, "grouped_id", None):
+                    group_id = str(message.grouped_id)
+                    grouped_messages.setdefault(group_id, []).append(message)
 
-            for message in messages:
-                group_id = str(message.grouped_id)
-                if group_id not in grouped_messages:
-                    grouped_messages[group_id] = []
-                grouped_messages[group_id].append(message)
+            # The album of the oldest message may continue in the next batch
+            tail = getattr(buffer[-1], "grouped_id", None) if buffer else None
+            complete = len(grouped_messages) - (1 if tail and not exhausted else 0)
+            if complete >= limit or exhausted:
+                break
 
+            history = await self._fetch_history_batches(limit - complete + 1, offset_id)
             if history:
-                offset_id = min(msg.id for msg in history) - 1
+                buffer.extend(sorted(history, key=lambda msg: msg.id, reverse=True))
+                offset_id = min(msg.id for msg in history)
             else:
-                break
+                exhausted = True
+
+        page_groups = dict(list(grouped_messages.items())[:limit])
+        page_ids = {msg.id for group in page_groups.values() for msg in group}
+        oldest = min(page_ids, default=None)
+        leftover = [msg for msg in buffer if oldest is not None and msg.id < oldest]
+
+        if page_groups:
+            consumed = len(buffer) - len(leftover)
+            self.messages_per_group += HISTORY_RATIO_SMOOTHING * (
+                consumed / len(page_groups) - self.messages_per_group
+            )
+
+        pagination.next_cursor = None
+        if leftover:
+            token = uuid4().hex
+            self.page_buffers.set(token, leftover)
+            pagination.next_cursor = encode_cursor(
+                {
+                    "offset_id": leftover[0].id + 1,
+                    "buffer": token,
+                    "history_offset": offset_id,
+                }
+            )
+        elif not exhausted:
+            pagination.next_cursor = encode_cursor({"offset_id": offset_id})
 
-        if len(grouped_messages) > total_messages_needed:
-            grouped_messages = dict(
-                list(grouped_messages.items())[:total_messages_needed]
+        return page_groups
+
+    async def _fetch_history_batches(
+        self, groups: int, offset_id: int
+    ) -> List[Message]:
+        """
+        Fetches enough history below offset_id for the given number of albums,
+        sized from the observed messages per album. When that's more than one
+        request can return, the batches are requested at the same time, each
+        one add_offset further into the history.
+        """
+        wanted = max(10, math.ceil(groups * self.messages_per_group * 1.25))
+        batches = math.ceil(wanted / HISTORY_BATCH_LIMIT)
+        size = min(wanted, HISTORY_BATCH_LIMIT)
+
+        results = await asyncio.gather(
+            *(
+                self._get_history(size, offset_id, add_offset=batch * size)
+                for batch in range(batches)
             )
+        )
+        history = {msg.id: msg for result in results for msg in result}
+        return list(history.values())
 
-        return grouped_messages
+    @staticmethod
+    def _page_cursor(pagination: PaginationData) -> Dict[str, Any]:
+        if not pagination.cursor:
+            return {"offset_id": pagination.offset_id}
+        cursor = decode_cursor(pagination.cursor)
+        if not isinstance(cursor.get("offset_id"), int) or not isinstance(
+            cursor.get("history_offset", 0), int
+        ):
+            raise BadRequestException("Invalid cursor")
+        return cursor
 
     async def paginate_posts(self, pagination: PaginationData) -> PaginatedPosts:
+        with rpc_context(Priority.LISTING, config.RPC_DEADLINE):
+            page = await self._list_page(pagination)
+
+        self._prefetch_images(page.data)
+        if config.IMAGE_PREFETCH_NEXT_PAGE and page.pagination.next_cursor:
+            next_pagination = PaginationData.from_parameters(
+                per_page=pagination.per_page, cursor=page.pagination.next_cursor
+            )
+            self.image_prefetcher.submit(
+                ("page", next_pagination.cursor, next_pagination.per_page),
+                partial(self._prefetch_page, next_pagination),
+            )
+
+        return page
+
+    def _prefetch_images(self, posts: List[Post]):
+        """
+        Queues the download of the images of a page into the image store, so
+        the image requests that follow a listing are served from disk.
+        """
+        if not image_store.max_bytes:  # Nowhere to keep them
+            return
+        for post in posts:
+            for size in map(ImageSize, config.IMAGE_PREFETCH_SIZES):
+                if image_store.resolve(post.message_id, size.value) is None:
+                    self.image_prefetcher.submit(
+                        ("image", post.message_id, size),
+                        partial(self.get_image, post.message_id, size),
+                    )
+
+    async def _prefetch_page(self, pagination: PaginationData):
+        page = await self._list_page(pagination)
+        self._prefetch_images(page.data)
+
+    async def _list_page(self, pagination: PaginationData) -> PaginatedPosts:
+        if self.index.ready:
+            return await asyncio.to_thread(self.index.paginate, pagination)
+        return await self._paginate(pagination)
+
+    async def _paginate(self, pagination: PaginationData) -> PaginatedPosts:
         posts: List[Post] = []
         grouped_posts = await self._grouped_posts(pagination)
         for group in grouped_posts.values():
@@ -131,74 +601,343 @@ class TelegramRepository:
 
         return PaginatedPosts(data=posts, pagination=pagination)
 
+    def _message_loader(
+        self, client: Optional[TelegramClientWrapper] = None
+    ) -> MessageLoader:
+        key = (client.name if client is not None else None, rpc_priority.get())
+        loader = self.message_loaders.get(key)
+        if loader is None:
+            loader = MessageLoader(
+                partial(self._load_messages, client),
+                window=config.MESSAGE_BATCH_WINDOW,
+            )
+            self.message_loaders[key] = loader
+        return loader
+
+    async def _load_messages(
+        self, client: Optional[TelegramClientWrapper], message_ids: List[int]
+    ) -> Dict[int, Message]:
+        """
+        Fetches a batch of messages in one request, with the given client or
+        the least-loaded one, caching the documents they carry.
+        """
+
+        async def get_messages(client: TelegramClientWrapper):
+            messages = await client.get_messages(client.channel, ids=message_ids)
+            messages = [msg for msg in messages if msg]
+            self._cache_documents(client, messages)
+            return {msg.id: msg for msg in messages}
+
+        if client is None:
+            return await self.clients.run(get_messages)
+        async with self.clients.acquire(client):
+            return await get_messages(client)
+
     async def get_post(self, message_id: int) -> Post:
-        messages = await self.client.get_messages(
-            self.channel, ids=[message_id, message_id + 1]
-        )
+        if self.index.ready:
+            post = await asyncio.to_thread(self.index.get_post, message_id)
+            if post is not None:
+                return post
+
+        with rpc_context(Priority.POST, config.RPC_DEADLINE):
+            messages = await self._message_loader().load_many(
+                [message_id, message_id + 1]
+            )
 
-        posts = sorted(messages, key=lambda x: x.id)
+        posts = sorted((msg for msg in messages if msg), key=lambda x: x.id)
         post = Post.from_messages(posts)
 
         return post
 
-    async def get_image(self, message_id: int):
-        messages = await self.client.get_messages(self.channel, ids=[message_id])
-        info = next(
+    async def get_posts(self, message_ids: List[int]) -> List[Post]:
+        """
+        Returns the posts with the given message IDs, in the same order,
+        skipping the ones that don't exist. Posts missing from the index are
+        fetched together, in as few requests as the loader can merge them.
+        """
+        posts: Dict[int, Post] = {}
+        if self.index.ready:
+            indexed = await asyncio.to_thread(self.index.get_posts, message_ids)
+            posts = {post.message_id: post for post in indexed}
+
+        missing = [message_id for message_id in message_ids if message_id not in posts]
+        if missing:
+            with rpc_context(Priority.POST, config.RPC_DEADLINE):
+                messages = await self._message_loader().load_many(
+                    dict.fromkeys(
+                        i
+                        for message_id in missing
+                        for i in (message_id, message_id + 1)
+                    )
+                )
+            loaded = {msg.id: msg for msg in messages if msg}
+            for message_id in missing:
+                group = [loaded[i] for i in (message_id, message_id + 1) if i in loaded]
+                if group and getattr(group[0], "message", None):
+                    posts[message_id] = Post.from_messages(group)
+
+        return [posts[message_id] for message_id in message_ids if message_id in posts]
+
+    @staticmethod
+    def _photo_location(photo, size: ImageSize):
+        """
+        Picks the smallest pre-sized variant of a photo that is at least as
+        wide as the requested size, falling back to the largest one. Returns
+        the location and the content key of the variant.
+        """
+        sizes = sorted(
             (
-                msg
-                for msg in messages
-                if msg.__class__.__name__ == "Message" and msg.message
+                photo_size
+                for photo_size in photo.sizes
+                if isinstance(photo_size, (PhotoSize, PhotoSizeProgressive))
             ),
-            None,
+            key=lambda photo_size: photo_size.w,
+        )
+        if not sizes:
+            return photo, image_store.content_key(photo.id, "full")
+
+        target = IMAGE_WIDTHS.get(size)
+        chosen = sizes[-1]
+        if target is not None:
+            chosen = next((s for s in sizes if s.w >= target), sizes[-1])
+
+        location = InputPhotoFileLocation(
+            id=photo.id,
+            access_hash=photo.access_hash,
+            file_reference=photo.file_reference,
+            thumb_size=chosen.type,
+        )
+        return location, image_store.content_key(photo.id, chosen.type)
+
+    async def _download_image(self, message_id: int, size: ImageSize):
+        async def download(client: TelegramClientWrapper):
+            # Images of a page are requested together and share one lookup
+            info = await self._message_loader(client).load_one(message_id)
+            photo = info.media.photo
+            location, key = self._photo_location(photo, size)
+            if image_store.contains(key):  # Same photo already stored for another post
+                return key, None
+            # The location carries no DC, which would send it to the home DC first
+            return key, await client.download_file(location, dc_id=photo.dc_id)
+
+        # Prefetches keep their background priority
+        with rpc_context(rpc_priority.get(), config.RPC_DEADLINE):
+            key, image = await self.clients.run(download)
+
+        if image is None:
+            image = await asyncio.to_thread(image_store.get, key)
+            if image is None:  # Evicted in the meantime
+                image_store.delete(key)
+                return await self._download_image(message_id, size)
+        else:
+            await asyncio.to_thread(image_store.set, key, image)
+        await asyncio.to_thread(image_store.link, message_id, size.value, key)
+        return key, image
+
+    async def get_image(
+        self, message_id: int, size: ImageSize = ImageSize.FULL
+    ) -> Tuple[str, bytes]:
+        """
+        Returns the content key and the bytes of a post image, reading it from
+        the image store when it is there and downloading (and storing) it
+        otherwise.
+        """
+        key = image_store.resolve(message_id, size.value)
+        if key is not None:
+            image = await asyncio.to_thread(image_store.get, key)
+            if image is not None:
+                return key, image
+
+        # A user request must not wait on a download queued at background
+        # priority, but a prefetch may join a download a user started
+        flight = (message_id, size, False)
+        if rpc_priority.get() == Priority.BACKGROUND:
+            if flight not in self.image_flights.calls:
+                flight = (message_id, size, True)
+        return await self.image_flights.do(
+            flight, partial(self._download_image, message_id, size)
         )
 
-        image = await self.client.download_file(info.media.photo)
-        return image
+    async def get_image_file(
+        self, message_id: int, size: ImageSize = ImageSize.FULL
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Returns the content key and the path of a post image in the image
+        store, downloading it first when needed. Returns None when the image
+        can't be stored.
+        """
+        key = image_store.resolve(message_id, size.value)
+        if key is None and image_store.max_bytes:
+            key, _ = await self.get_image(message_id, size)
+        path = image_store.get_path(key) if key is not None else None
+        return (key, path) if path is not None else None
 
-    async def get_video(self, message_id: int, document_id: int, start: int, end: int):
-        document = cache.get(document_id)
+    async def get_document(
+        self,
+        message_id: int,
+        document_id: int,
+        client: Optional[TelegramClientWrapper] = None,
+    ):
+        """
+        Returns the document as seen by a client. Access hashes are per
+        account, so each client resolves and caches its own copy.
+        """
+        priority = Priority.POST if client is None else rpc_priority.get()
+        client = client or self.clients.pick()
+        document = cache.get((client.name, document_id))
         if not document:
-            messages = await self.client.get_messages(self.channel, ids=[message_id])
-            media = next(
-                (
-                    msg
-                    for msg in messages
-                    if msg.__class__.__name__ == "Message" and msg.media
-                ),
-                None,
-            )
+            with rpc_context(priority, config.RPC_DEADLINE):
+                # Streams starting together share one lookup per client
+                media = await self._message_loader(client).load_one(message_id)
             document = media.media.document
-            cache.set(document_id, document)
+        return document
+
+    async def _download_chunk(
+        self, message_id: int, document_id: int, chunk_index: int
+    ) -> bytes:
+        # Every chunk goes to the least-loaded account, and to another one
+        # when that account hits a FloodWait
+        return await self.clients.run(
+            partial(
+                self._download_chunk_with,
+                message_id=message_id,
+                document_id=document_id,
+                chunk_index=chunk_index,
+            )
+        )
 
-        async for chunk in self.client.iter_download(
+    async def _download_chunk_with(
+        self,
+        client: TelegramClientWrapper,
+        message_id: int,
+        document_id: int,
+        chunk_index: int,
+        refreshed: bool = False,
+    ) -> bytes:
+        document = await self.get_document(message_id, document_id, client)
+        _, location = utils.get_input_location(document)
+        request = GetFileRequest(
+            location, offset=chunk_index * CHUNK_SIZE, limit=CHUNK_SIZE
+        )
+        try:
+            async with client.sender_pool.acquire(document.dc_id) as sender:
+                result = await client._call(sender, request)
+            if isinstance(result, File):
+                return self._checked_chunk(document, chunk_index, result.bytes)
+        except (FileReferenceExpiredError, FilerefUpgradeNeededError) as e:
+            if refreshed:
+                raise
+            # The cached document carries the stale reference; load it again
+            logger.info(f"Refreshing file reference of document {document_id}: {e}")
+            cache.delete((client.name, document.id))
+            return await self._download_chunk_with(
+                client, message_id, document_id, chunk_index, refreshed=True
+            )
+        except (FileMigrateError, ConnectionError) as e:
+            logger.info(f"Falling back to iter_download for chunk {chunk_index}: {e}")
+
+        # CDN redirects, migrations and reconnections are handled by Telethon
+        async with client.iter_download(
             document,
-            offset=start,
-            limit=end - start + 1,
-            chunk_size=1024 * 1024,
-            stride=1024 * 1024,
+            offset=chunk_index * CHUNK_SIZE,
+            limit=1,
+            chunk_size=CHUNK_SIZE,
+            request_size=CHUNK_SIZE,
             dc_id=document.dc_id,
             file_size=document.size,
+        ) as download:
+            async for chunk in download:
+                return self._checked_chunk(document, chunk_index, chunk)
+        return self._checked_chunk(document, chunk_index, b"")
+
+    @staticmethod
+    def _checked_chunk(document, chunk_index: int, chunk: bytes) -> bytes:
+        """
+        Rejects chunks shorter or longer than their place in the file, so a
+        partial download never reaches the chunk store or the client.
+        """
+        expected = min(CHUNK_SIZE, document.size - chunk_index * CHUNK_SIZE)
+        if len(chunk) != expected:
+            raise ServiceUnavailableException(
+                f"Telegram returned {len(chunk)} of {expected} bytes "
+                f"for chunk {chunk_index} of document {document.id}"
+            )
+        return chunk
+
+    async def _fetch_chunk(
+        self, message_id: int, document_id: int, chunk_index: int
+    ) -> bytes:
+        chunk = await asyncio.to_thread(chunk_store.get, document_id, chunk_index)
+        if chunk is None:
+            with rpc_context(Priority.STREAM, config.RPC_DEADLINE):
+                chunk = await self._download_chunk(message_id, document_id, chunk_index)
+            await asyncio.to_thread(chunk_store.set, document_id, chunk_index, chunk)
+        return chunk
+
+    async def _load_chunk(
+        self, message_id: int, document_id: int, chunk_index: int
+    ) -> bytes:
+        # Concurrent viewers of the same chunk share a single fetch
+        return await self.chunk_flights.do(
+            (document_id, chunk_index),
+            partial(self._fetch_chunk, message_id, document_id, chunk_index),
+        )
+
+    async def get_video(
+        self,
+        message_id: int,
+        document_id: int,
+        start: int,
+        end: int,
+        client_key: Optional[str] = None,
+    ):
+        document = await self.get_document(message_id, document_id)
+        plan = plan_range(start, end, document.size, chunk_size=CHUNK_SIZE)
+
+        load = partial(self._load_chunk, message_id, document.id)
+        if client_key is not None:
+            session = self.prefetcher.start_request(
+                client_key,
+                document.id,
+                plan.first_chunk,
+                plan.last_chunk,
+                max_chunk=plan.max_chunk,
+                load=load,
+            )
+            load = session.get_chunk
+
+        async for chunk_index, chunk in self.downloader.iter_chunks(
+            load, plan.chunk_indexes
         ):
-            yield chunk
+            yield plan.trim(chunk_index, chunk)
 
     async def paginate_with_search(self, pagination: PaginationData) -> PaginatedPosts:
+        if self.index.ready:
+            return await asyncio.to_thread(self.index.search, pagination)
+
         posts: List[Post] = []
         grouped_messages = {}
         limit = pagination.per_page
         search_query = pagination.search
         offset_id = pagination.offset_id
 
-        async for message in self.client.iter_messages(
-            self.channel, search=search_query, reverse=False, offset_id=offset_id
-        ):
-            if hasattr(message, "grouped_id") and message.grouped_id:
-                group_id = str(message.grouped_id)
-                if group_id not in grouped_messages:
-                    grouped_messages[group_id] = []
-                grouped_messages[group_id].append(message)
+        with rpc_context(Priority.SEARCH, config.RPC_DEADLINE):
+            async with self.clients.acquire() as client:
+                async for message in client.iter_messages(
+                    client.channel,
+                    search=search_query,
+                    reverse=False,
+                    offset_id=offset_id,
+                ):
+                    self._cache_documents(client, [message])
+                    if hasattr(message, "grouped_id") and message.grouped_id:
+                        group_id = str(message.grouped_id)
+                        if group_id not in grouped_messages:
+                            grouped_messages[group_id] = []
+                        grouped_messages[group_id].append(message)
 
-                if len(grouped_messages) >= limit:  # Parar ao atingir o limite
-                    break
+                        if len(grouped_messages) >= limit:  # Parar ao atingir o limite
+                            break
 
         for group in grouped_messages.values():
             info = next(
@@ -234,7 +973,18 @@ class TelegramRepository:
 
         return PaginatedPosts(data=posts, pagination=pagination)
 
-    async def get_top_post(self) -> Optional[Post]:
+    async def filter_posts(
+        self, filters: Dict[str, List[str]], pagination: PaginationData
+    ) -> FilteredPosts:
+        if not self.index.ready:
+            raise ServiceUnavailableException("Post index is still being built")
+        return await asyncio.to_thread(self.index.filter, filters, pagination)
+
+    async def get_top_posts(
+        self, window: TopWindow = TopWindow.WEEK, count: int = 10
+    ) -> List[Post]:
+        if self.index.ready:
+            return await asyncio.to_thread(self.index.get_top_posts, window, count)
 
         limit = 100
         offset_id = 0
@@ -244,7 +994,9 @@ class TelegramRepository:
             pagination = PaginationData.from_parameters(
                 per_page=limit, offset_id=offset_id
             )
-            paginated_posts = await self.paginate_posts(pagination)
+            # Not paginate_posts: these pages are never shown, so no image prefetch
+            with rpc_context(Priority.LISTING, config.RPC_DEADLINE):
+                paginated_posts = await self._list_page(pagination)
 
             if not paginated_posts.data:
                 break
@@ -255,10 +1007,24 @@ class TelegramRepository:
             if len(posts) >= limit:
                 break
 
-        top_post = max(
-            posts,
-            key=lambda post: sum(reaction["count"] for reaction in post.reactions),
-            default=None,
+        span = TOP_WINDOWS[window.value]
+        if span is not None:
+            cutoff = time.time() - span
+            posts = [
+                post
+                for post in posts
+                if datetime.fromisoformat(post.date).timestamp() >= cutoff
+            ]
+
+        posts.sort(
+            key=lambda post: (
+                sum(reaction["count"] for reaction in post.reactions),
+                post.message_id,
+            ),
+            reverse=True,
         )
+        return posts[:count]
 
-        return top_post
+    async def get_top_post(self, window: TopWindow = TopWindow.WEEK) -> Optional[Post]:
+        posts = await self.get_top_posts(window, 1)
+        return posts[0] if posts else None
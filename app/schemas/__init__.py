@@ -1,3 +1,6 @@
-from .health import DebugInfo, HealthResponse
+from .health import DebugInfo, HealthResponse, ReadinessResponse, WarmUpLevel
+from .image import ImageSize
 from .pagination import PaginationData
 from .post import Post, PaginatedPosts
+from .facet import FacetCount, FilteredPosts
+from .top import TopWindow
@@ -0,0 +1,22 @@
+from typing import Dict, List
+
+from pydantic import Field
+from pydantic.dataclasses import dataclass
+
+from app.schemas import PaginationData
+from app.schemas.post import Post
+
+
+@dataclass
+class FacetCount:
+    value: str = Field(..., description="Facet value")
+    count: int = Field(..., description="Number of posts with the value")
+
+
+@dataclass
+class FilteredPosts:
+    data: List[Post] = Field(..., description="List of posts")
+    pagination: PaginationData = Field(..., description="Pagination data")
+    facets: Dict[str, List[FacetCount]] = Field(
+        ..., description="Post counts per value of each facet"
+    )
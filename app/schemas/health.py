@@ -1,4 +1,6 @@
 from datetime import datetime
+from enum import IntEnum
+from typing import Dict
 
 from pydantic.dataclasses import dataclass
 from pydantic.fields import Field
@@ -17,3 +19,19 @@ class DebugInfo:
 class HealthResponse:
     is_healthy: bool = Field(True, description="Health status")
     debug_info: DebugInfo = Field(..., description="Debug information")
+    caches: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict, description="Hit and miss counters of the caches"
+    )
+
+
+class WarmUpLevel(IntEnum):
+    STARTING = 0
+    CONNECTED = 1
+    WARM = 2
+
+
+@dataclass
+class ReadinessResponse:
+    is_ready: bool = Field(..., description="Whether the server takes traffic")
+    warm_up_level: str = Field(..., description="Current warm-up level")
+    required_level: str = Field(..., description="Warm-up level required to be ready")
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class ImageSize(str, Enum):
+    THUMB = "thumb"
+    MEDIUM = "medium"
+    FULL = "full"
@@ -17,6 +17,8 @@ class PaginationData:
     max_id: int = Field(0, description="Max ID")
     min_id: int = Field(0, description="Min ID")
     search: Optional[str] = Field(None, description="Search query")
+    cursor: Optional[str] = Field(None, description="Cursor of the requested page")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page")
 
     @classmethod
     def from_parameters(cls, **kwargs) -> "PaginationData":
@@ -31,4 +33,5 @@ class PaginationData:
             max_id=kwargs.get("max_id", 0),
             min_id=kwargs.get("min_id", 0),
             search=kwargs.get("search"),
+            cursor=kwargs.get("cursor"),
         )
@@ -5,8 +5,7 @@ from pydantic.dataclasses import dataclass, Field
 from telethon.tl.types import Message
 
 from app.schemas import PaginationData
-from core.cache import cache
-from core.utils import parse_message_content
+from core.cache import parse_cache
 
 
 @dataclass
@@ -27,10 +26,11 @@ class Post:
     message_document_id: Optional[int] = Field(
         None, description="Message ID of the document"
     )
+    thumbnail_url: str = Field("", description="URL of the image thumbnail")
 
     @classmethod
     def from_message(cls, message: Message) -> "Post":
-        parsed_content = parse_message_content(message.message)
+        parsed_content = parse_cache.parse(message.id, message.message)
 
         reactions = []
         if message.reactions:
@@ -60,7 +60,7 @@ class Post:
             author=message.post_author,
             reactions=reactions,
             original_content=message.message,
-            parsed_content=parsed_content.to_dict(),
+            parsed_content=parsed_content,
             document_id=None,
             document_size=None,
             message_document_id=None,
@@ -78,7 +78,7 @@ class Post:
             None,
         )
 
-        parsed_content = parse_message_content(info_message.message)
+        parsed_content = parse_cache.parse(info_message.id, info_message.message)
 
         reactions = []
         if info_message.reactions:
@@ -95,25 +95,6 @@ class Post:
                 if hasattr(result.reaction, "emoticon")
             ]
 
-        # document = media_message.media.document
-        #
-        # document_cache = cache.get(document.id)
-        # if not document_cache:
-        #     cache.set(document.id, document)
-
-        if (
-            media_message
-            and media_message.media
-            and hasattr(media_message.media, "document")
-        ):
-            document = media_message.media.document
-
-            document_cache = cache.get(document.id)
-            if not document_cache:
-                cache.set(document.id, document)
-        else:
-            document = None
-
         return cls(
             image_url="",  # Atualize se necessário
             video_url="",  # Atualize se necessário
@@ -127,7 +108,7 @@ class Post:
             author=info_message.post_author,
             reactions=reactions,
             original_content=info_message.message,
-            parsed_content=parsed_content.to_dict(),
+            parsed_content=parsed_content,
             document_id=media_message.media.document.id if media_message else None,
             document_size=media_message.media.document.size if media_message else None,
             message_document_id=media_message.id if media_message else None,
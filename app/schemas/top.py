@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class TopWindow(str, Enum):
+    TODAY = "today"
+    WEEK = "week"
+    ALL = "all"
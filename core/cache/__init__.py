@@ -1,3 +1,22 @@
+from core import config
 from .cache_manager import CacheManager
+from .chunk_store import CHUNK_SIZE, ChunkStore
+from .disk_store import DiskStore
+from .image_store import ImageStore
+from .parse_cache import ParseCache
+from .response_cache import ResponseCache
+from .snapshot import load_snapshot, pack_tl, save_snapshot, unpack_tl
 
 cache = CacheManager(max_size=1000, ttl=3600)
+chunk_store = ChunkStore(
+    directory=config.CHUNK_CACHE_DIR, max_bytes=config.CHUNK_CACHE_MAX_BYTES
+)
+image_store = ImageStore(
+    directory=config.IMAGE_CACHE_DIR, max_bytes=config.IMAGE_CACHE_MAX_BYTES
+)
+response_cache = ResponseCache(
+    fresh_ttl=config.RESPONSE_CACHE_TTL,
+    stale_ttl=config.RESPONSE_CACHE_STALE_TTL,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+)
+parse_cache = ParseCache(max_entries=config.PARSE_CACHE_MAX_ENTRIES)
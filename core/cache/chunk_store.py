@@ -0,0 +1,35 @@
+from typing import Optional
+
+from core.utils.range_planner import CHUNK_SIZE
+from .disk_store import DiskStore
+
+
+class ChunkStore(DiskStore):
+    def __init__(self, directory, max_bytes, chunk_size=CHUNK_SIZE):
+        """
+        Initializes the ChunkStore.
+
+        Stores aligned video chunks keyed by ``(document_id, chunk_index)``.
+
+        :param directory: Directory where the chunk files are written.
+        :param max_bytes: Maximum total size of the stored chunks in bytes (0 disables the store).
+        :param chunk_size: Size of each chunk in bytes (default 1 MiB).
+        """
+        super().__init__(directory, max_bytes, suffix=".chunk")
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _key(document_id, chunk_index) -> str:
+        return f"{document_id}_{chunk_index}"
+
+    def contains(self, document_id, chunk_index) -> bool:
+        return super().contains(self._key(document_id, chunk_index))
+
+    def get(self, document_id, chunk_index) -> Optional[bytes]:
+        return super().get(self._key(document_id, chunk_index))
+
+    def set(self, document_id, chunk_index, data: bytes):
+        super().set(self._key(document_id, chunk_index), data)
+
+    def delete(self, document_id, chunk_index):
+        super().delete(self._key(document_id, chunk_index))
@@ -0,0 +1,146 @@
+import collections
+import os
+import threading
+from typing import Optional
+
+from core import logger
+
+
+class DiskStore:
+    def __init__(self, directory, max_bytes, suffix):
+        """
+        Initializes the DiskStore.
+
+        Values are stored as one file per key under ``directory`` and evicted
+        in least-recently-used order once the total size goes over
+        ``max_bytes``. The index is rebuilt from the directory on startup, so
+        stored values survive restarts.
+
+        :param directory: Directory where the files are written.
+        :param max_bytes: Maximum total size of the stored files in bytes (0 disables the store).
+        :param suffix: File extension of the stored files.
+        """
+        logger.info(
+            f"Initializing disk store at {directory} with max_bytes: {max_bytes}"
+        )
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.total_bytes = 0
+        self.order = collections.OrderedDict()  # key -> size
+        self.lock = threading.Lock()
+        self._load()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def _load(self):
+        """
+        Rebuilds the LRU index from the files already on disk.
+        """
+        if not self.max_bytes:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            key, ext = os.path.splitext(entry.name)
+            if ext != self.suffix:
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, key, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.order[key] = size
+            self.total_bytes += size
+
+        self._evict()
+
+    def contains(self, key: str) -> bool:
+        return key in self.order
+
+    def get_path(self, key: str) -> Optional[str]:
+        """
+        Returns the path of a stored file and marks it as recently used.
+        """
+        with self.lock:
+            if key not in self.order:
+                return None
+            self.order.move_to_end(key)
+
+        path = self.path(key)
+        try:
+            os.utime(path)  # Keeps the LRU order across restarts
+        except FileNotFoundError:
+            self.delete(key)
+            return None
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            self.delete(key)
+            return None
+
+        logger.debug(f"Disk store hit: {key}")
+        return data
+
+    def set(self, key: str, data: bytes):
+        if not self.max_bytes or len(data) > self.max_bytes:
+            return
+
+        path = self.path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_bytes -= self.order.pop(key, 0)
+            self.order[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.total_bytes -= self.order.pop(key, 0)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        logger.info(f"Clearing disk store at {self.directory}")
+        with self.lock:
+            keys = list(self.order)
+            self.order.clear()
+            self.total_bytes = 0
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the store fits in max_bytes.
+        Must be called with the lock held (or during initialization).
+        """
+        while self.order and self.total_bytes > self.max_bytes:
+            key, size = self.order.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_cache_size(self):
+        """
+        Returns the current total size of the stored files in bytes.
+        """
+        return self.total_bytes
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from typing import Iterable, Optional
+
+from core import logger
+from .disk_store import DiskStore
+
+
+class ImageStore(DiskStore):
+    def __init__(self, directory, max_bytes, max_aliases=10000):
+        """
+        Initializes the ImageStore.
+
+        Images are stored by content key (photo id and size variant), so the
+        same photo attached to several posts is stored once. Each
+        ``(message_id, size)`` pair is mapped to its content key through an
+        alias index that is persisted next to the images, so hits don't need
+        to ask Telegram which photo a post has.
+
+        :param directory: Directory where the image files are written.
+        :param max_bytes: Maximum total size of the stored images in bytes (0 disables the store).
+        :param max_aliases: Maximum number of message aliases kept (default 10000).
+        """
+        self.max_aliases = max_aliases
+        self.aliases = {}  # "message_id:size" -> content key
+        self.alias_lock = threading.Lock()
+        super().__init__(directory, max_bytes, suffix=".jpg")
+        self._load_aliases()
+
+    @property
+    def aliases_path(self) -> str:
+        return os.path.join(self.directory, "aliases.json")
+
+    @staticmethod
+    def _alias(message_id, size) -> str:
+        return f"{message_id}:{size}"
+
+    @staticmethod
+    def content_key(photo_id, variant) -> str:
+        return f"{photo_id}_{variant}"
+
+    def _load_aliases(self):
+        if not self.max_bytes:
+            return
+        try:
+            with open(self.aliases_path) as file:
+                aliases = json.load(file)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"Ignoring corrupt image alias index: {e}")
+            return
+
+        self.aliases = {
+            alias: key for alias, key in aliases.items() if key in self.order
+        }
+
+    def _save_aliases(self):
+        with self.alias_lock:
+            aliases = dict(self.aliases)
+        tmp_path = f"{self.aliases_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(aliases, file)
+        os.replace(tmp_path, self.aliases_path)
+
+    def resolve(self, message_id, size) -> Optional[str]:
+        """
+        Returns the content key stored for a message image, if any.
+        """
+        key = self.aliases.get(self._alias(message_id, size))
+        return key if key is not None and self.contains(key) else None
+
+    def link(self, message_id, size, key: str):
+        """
+        Points a message image at a stored content key.
+        """
+        if not self.max_bytes:
+            return
+        with self.alias_lock:
+            self.aliases.pop(self._alias(message_id, size), None)
+            self.aliases[self._alias(message_id, size)] = key
+            while len(self.aliases) > self.max_aliases:
+                self.aliases.pop(next(iter(self.aliases)))
+        self._save_aliases()
+
+    def unlink(self, message_ids: Iterable[int]):
+        """
+        Forgets which images edited or deleted messages point at. The images
+        themselves stay stored for the other posts that share them.
+        """
+        if not self.max_bytes:
+            return
+        prefixes = tuple(self._alias(message_id, "") for message_id in message_ids)
+        with self.alias_lock:
+            stale = [alias for alias in self.aliases if alias.startswith(prefixes)]
+            for alias in stale:
+                del self.aliases[alias]
+        if stale:
+            self._save_aliases()
+
+    def clear(self):
+        super().clear()
+        with self.alias_lock:
+            self.aliases.clear()
+        if self.max_bytes:
+            self._save_aliases()
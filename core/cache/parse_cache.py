@@ -0,0 +1,82 @@
+import collections
+import hashlib
+import threading
+
+from core import logger
+from core.utils import parse_message_content
+
+
+class ParseCache:
+    def __init__(self, max_entries=5000):
+        """
+        Initializes the ParseCache.
+
+        Keeps the parsed content of the most recently used messages, keyed
+        by message ID and versioned by a hash of their text, so an edited
+        message is parsed again the next time it is seen. The returned dicts
+        are shared and must not be modified.
+
+        :param max_entries: Maximum number of parsed messages kept (0 disables the cache).
+        """
+        logger.info(f"Initializing parse cache with max_entries: {max_entries}")
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # message_id -> (version, parsed)
+        # The post index parses from worker threads
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version(content: str) -> bytes:
+        return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+    def parse(self, message_id: int, content: str) -> dict:
+        """
+        Returns the parsed content of a message as a dict.
+        :param message_id: ID of the message.
+        :param content: Text of the message.
+        """
+        if not self.max_entries:
+            return parse_message_content(content).to_dict()
+
+        version = self._version(content)
+        with self.lock:
+            entry = self.entries.get(message_id)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                self.entries.move_to_end(message_id)
+                return entry[1]
+            self.misses += 1
+
+        parsed = parse_message_content(content).to_dict()
+        with self.lock:
+            self.entries[message_id] = (version, parsed)
+            self.entries.move_to_end(message_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return parsed
+
+    def set(self, message_id: int, content: str, parsed: dict):
+        """
+        Stores content parsed elsewhere, such as by the bulk parser.
+        """
+        if not self.max_entries:
+            return
+        with self.lock:
+            self.entries[message_id] = (self._version(content), parsed)
+            self.entries.move_to_end(message_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, message_id: int):
+        """
+        Drops the parsed content of an edited or deleted message.
+        """
+        with self.lock:
+            self.entries.pop(message_id, None)
+
+    def get_cache_size(self):
+        """
+        Returns the current number of parsed messages.
+        """
+        return len(self.entries)
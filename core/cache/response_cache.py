@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import time
+from typing import Awaitable, Callable, Hashable
+
+from core import logger
+from core.utils import SingleFlight
+
+
+class ResponseCache:
+    def __init__(self, fresh_ttl=30, stale_ttl=300, max_entries=1000):
+        """
+        Initializes the ResponseCache.
+
+        Caches rendered responses with stale-while-revalidate semantics: an
+        entry younger than ``fresh_ttl`` is served as is; one that is older
+        but still inside the ``stale_ttl`` window is served while a single
+        background task renders it again. Concurrent misses for a key share
+        one render, and ``invalidate`` drops everything when the underlying
+        data changes.
+
+        :param fresh_ttl: Seconds an entry is served without revalidation (0 disables the cache).
+        :param stale_ttl: Extra seconds an expired entry may be served while it is refreshed.
+        :param max_entries: Maximum number of cached responses (default 1000).
+        """
+        logger.info(
+            f"Initializing response cache with fresh_ttl: {fresh_ttl}, "
+            f"stale_ttl: {stale_ttl} and max_entries: {max_entries}"
+        )
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> (created, value)
+        self.flights = SingleFlight()
+        self.generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get_or_set(self, key: Hashable, render: Callable[[], Awaitable]):
+        """
+        Returns the cached value for key, rendering it when missing or stale.
+        :param key: Normalized description of the request.
+        :param render: Coroutine function that produces the value.
+        """
+        if not self.fresh_ttl:
+            return await render()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            created, value = entry
+            age = time.monotonic() - created
+            if age < self.fresh_ttl:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return value
+            if age < self.fresh_ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self.entries.move_to_end(key)
+                if key not in self.flights.calls:
+                    task = asyncio.ensure_future(self._refresh(key, render))
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                return value
+
+        self.misses += 1
+        return await self.flights.do(key, lambda: self._render(key, render))
+
+    async def _render(self, key: Hashable, render: Callable[[], Awaitable]):
+        generation = self.generation
+        value = await render()
+        # A render that started before an invalidation may hold old data
+        if generation == self.generation:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    async def _refresh(self, key: Hashable, render: Callable[[], Awaitable]):
+        try:
+            await self.flights.do(key, lambda: self._render(key, render))
+        except Exception as e:
+            logger.warning(f"Failed to refresh cached response {key}: {e}")
+
+    def dump(self) -> list:
+        """
+        Returns the cached responses as (wall clock creation time, key, value).
+        """
+        offset = time.time() - time.monotonic()
+        return [
+            (created + offset, key, value)
+            for key, (created, value) in self.entries.items()
+        ]
+
+    def restore(self, entries: list):
+        """
+        Loads responses returned by dump. They are restored as stale, so the
+        first request for each one is answered at once and renders it again.
+        """
+        now = time.time()
+        for created, key, value in entries:
+            age = now - created
+            if age < self.fresh_ttl + self.stale_ttl:
+                self.entries[key] = (time.monotonic() - max(age, self.fresh_ttl), value)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drops every cached response.
+        """
+        self.generation += 1
+        self.entries.clear()
+
+    def get_cache_size(self):
+        """
+        Returns the current number of cached responses.
+        """
+        return len(self.entries)
@@ -0,0 +1,58 @@
+import os
+import pickle
+import time
+
+from telethon.extensions import BinaryReader
+from telethon.tl.tlobject import TLObject
+
+from core import logger
+
+SNAPSHOT_VERSION = 1
+
+
+def pack_tl(obj: TLObject) -> bytes:
+    """
+    Serializes a Telegram object the way Telegram itself does, which keeps
+    snapshots readable across Telethon upgrades within the same layer.
+    """
+    return bytes(obj)
+
+
+def unpack_tl(data: bytes) -> TLObject:
+    with BinaryReader(data) as reader:
+        return reader.tgread_object()
+
+
+def save_snapshot(path: str, state: dict):
+    """
+    Writes the hot state of the server to path, replacing the previous
+    snapshot atomically.
+    """
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(
+            {"version": SNAPSHOT_VERSION, "saved_at": time.time(), **state}, file
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Saved snapshot to {path}")
+
+
+def load_snapshot(path: str) -> dict:
+    """
+    Reads the snapshot written by save_snapshot. Returns an empty dict when
+    there is none or it can't be read.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+    except Exception as e:
+        logger.warning(f"Failed to load snapshot from {path}: {e}")
+        return {}
+    if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+        return {}
+    return state
@@ -1,4 +1,4 @@
-from os import getenv
+from os import cpu_count, getenv
 
 from dotenv import load_dotenv
 
@@ -8,5 +8,72 @@ API_ID = int(getenv("API_ID", ""))
 API_HASH = getenv("API_HASH", "")
 BOT_TOKEN = getenv("BOT_TOKEN", "")
 STRING_SESSION = getenv("STRING_SESSION", "")
+STRING_SESSIONS = [
+    session.strip()
+    for session in (getenv("STRING_SESSIONS") or STRING_SESSION).split(",")
+    if session.strip()
+]
 CHANNEL_ID = int(getenv("CHANNEL_ID", ""))
 OPENAI_API_KEY = getenv("OPENAI_API_KEY", "")
+
+CHUNK_CACHE_DIR = getenv("CHUNK_CACHE_DIR", ".cache/chunks")
+CHUNK_CACHE_MAX_BYTES = int(getenv("CHUNK_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+STREAM_CONCURRENCY = int(getenv("STREAM_CONCURRENCY", "4"))
+STREAM_BUFFER_CHUNKS = int(getenv("STREAM_BUFFER_CHUNKS", "8"))
+PREFETCH_CHUNKS = int(getenv("PREFETCH_CHUNKS", "4"))
+PREFETCH_SESSION_TTL = int(getenv("PREFETCH_SESSION_TTL", "60"))
+
+SENDER_POOL_SIZE = int(getenv("SENDER_POOL_SIZE", "2"))
+SENDER_POOL_KEEPALIVE = int(getenv("SENDER_POOL_KEEPALIVE", "60"))
+SENDER_POOL_WARM_DCS = int(getenv("SENDER_POOL_WARM_DCS", "2"))
+
+RPC_RATE_LIMITS = {
+    method.strip(): tuple(float(value) for value in limit.split(":"))
+    for method, _, limit in (
+        item.partition("=")
+        for item in getenv(
+            "RPC_RATE_LIMITS",
+            "GetFileRequest=30:60,GetHistoryRequest=5:10,"
+            "GetMessagesRequest=10:20,SearchRequest=2:4",
+        ).split(",")
+        if item.strip()
+    )
+}
+RPC_DEFAULT_RATE_LIMIT = tuple(
+    float(value) for value in getenv("RPC_DEFAULT_RATE_LIMIT", "10:20").split(":")
+)
+RPC_DEADLINE = float(getenv("RPC_DEADLINE", "15"))
+MESSAGE_BATCH_WINDOW = float(getenv("MESSAGE_BATCH_WINDOW", "0.005"))
+
+POST_INDEX_PATH = getenv("POST_INDEX_PATH", ".cache/posts.db")
+SNAPSHOT_PATH = getenv("SNAPSHOT_PATH", ".cache/snapshot.pickle")
+WARM_UP_LEVEL = getenv("WARM_UP_LEVEL", "warm").lower()
+if WARM_UP_LEVEL not in ("connected", "warm"):
+    raise ValueError(f"WARM_UP_LEVEL must be connected or warm, not {WARM_UP_LEVEL!r}")
+REACTIONS_REFRESH_MIN_INTERVAL = float(getenv("REACTIONS_REFRESH_MIN_INTERVAL", "30"))
+REACTIONS_REFRESH_MAX_INTERVAL = float(getenv("REACTIONS_REFRESH_MAX_INTERVAL", "600"))
+REACTIONS_REFRESH_RECENT = int(getenv("REACTIONS_REFRESH_RECENT", "200"))
+REACTIONS_REFRESH_TOP = int(getenv("REACTIONS_REFRESH_TOP", "100"))
+
+RESPONSE_CACHE_TTL = float(getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_STALE_TTL = float(getenv("RESPONSE_CACHE_STALE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+PARSE_CACHE_MAX_ENTRIES = int(getenv("PARSE_CACHE_MAX_ENTRIES", "5000"))
+PARSE_WORKERS = int(getenv("PARSE_WORKERS") or cpu_count() or 1)
+
+IMAGE_CACHE_MAX_AGE = int(getenv("IMAGE_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+IMAGE_CACHE_DIR = getenv("IMAGE_CACHE_DIR", ".cache/images")
+IMAGE_CACHE_MAX_BYTES = int(getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024**2)))
+IMAGE_PREFETCH_CONCURRENCY = int(getenv("IMAGE_PREFETCH_CONCURRENCY", "2"))
+IMAGE_PREFETCH_SIZES = [
+    size.strip().lower()
+    for size in getenv("IMAGE_PREFETCH_SIZES", "full").split(",")
+    if size.strip()
+]
+if not set(IMAGE_PREFETCH_SIZES) <= {"thumb", "medium", "full"}:
+    raise ValueError(
+        f"IMAGE_PREFETCH_SIZES must list thumb, medium or full, "
+        f"not {','.join(IMAGE_PREFETCH_SIZES)!r}"
+    )
+IMAGE_PREFETCH_NEXT_PAGE = getenv("IMAGE_PREFETCH_NEXT_PAGE", "false").lower() == "true"
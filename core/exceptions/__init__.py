@@ -4,6 +4,7 @@ from .base import (
     DuplicateValueException,
     ForbiddenException,
     NotFoundException,
+    ServiceUnavailableException,
     UnauthorizedException,
     UnprocessableEntity,
 )
@@ -16,4 +17,5 @@ __all__ = [
     "UnauthorizedException",
     "UnprocessableEntity",
     "DuplicateValueException",
+    "ServiceUnavailableException",
 ]
@@ -1 +1,15 @@
+from .background_prefetcher import BackgroundPrefetcher
+from .client_pool import ClientPool
+from .downloader import ParallelDownloader
+from .message_loader import MessageLoader
+from .prefetcher import PlaybackSession, Prefetcher
+from .reaction_refresher import ReactionRefresher
+from .scheduler import (
+    Priority,
+    RpcDeadlineExceeded,
+    RpcScheduler,
+    rpc_context,
+    rpc_priority,
+)
+from .sender_pool import SenderPool
 from .telegram_client import TelegramClientWrapper
@@ -0,0 +1,69 @@
+import asyncio
+import collections
+from typing import Awaitable, Callable, Hashable, List, Set
+
+from core import logger
+from .scheduler import Priority, rpc_context
+
+
+class BackgroundPrefetcher:
+    def __init__(self, concurrency=2, max_pending=200):
+        """
+        Initializes the BackgroundPrefetcher.
+
+        Runs best-effort jobs (such as warming the image store for a page
+        that was just listed) on a fixed number of workers, with every RPC
+        they make at background priority so they only use the Telegram
+        budget that user requests leave free. Jobs are deduplicated by key
+        and the oldest pending ones are dropped when the queue is full.
+
+        :param concurrency: Number of jobs run at the same time (0 disables prefetching).
+        :param max_pending: Maximum number of queued jobs (default 200).
+        """
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.pending = collections.OrderedDict()  # key -> job
+        self.running: Set[Hashable] = set()
+        self.ready = asyncio.Event()
+        self.workers: List[asyncio.Task] = []
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable]):
+        """
+        Queues a job unless one with the same key is already queued or running.
+        """
+        if not self.concurrency or key in self.pending or key in self.running:
+            return
+
+        self.pending[key] = job
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+        if not self.workers:
+            self.workers = [
+                asyncio.create_task(self._work()) for _ in range(self.concurrency)
+            ]
+        self.ready.set()
+
+    async def _work(self):
+        with rpc_context(Priority.BACKGROUND):
+            while True:
+                if not self.pending:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+
+                key, job = self.pending.popitem(last=False)
+                self.running.add(key)
+                try:
+                    await job()
+                except Exception as e:
+                    logger.debug(f"Background prefetch of {key} failed: {e}")
+                finally:
+                    self.running.discard(key)
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.pending.clear()
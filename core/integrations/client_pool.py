@@ -0,0 +1,117 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from telethon.errors import FloodWaitError
+
+from core import config, logger
+from .scheduler import rpc_failover
+from .telegram_client import TelegramClientWrapper
+
+T = TypeVar("T")
+
+
+class ClientPool:
+    def __init__(self, clients: List[TelegramClientWrapper]):
+        """
+        Initializes the ClientPool.
+
+        Routes each request to the least-loaded healthy client. A client that
+        hits a FloodWait is taken out of rotation until the wait is over, and
+        clients that failed to start are never picked.
+
+        :param clients: Telegram clients, one per account. The first one is the primary.
+        """
+        self.clients = clients
+
+    @classmethod
+    def from_sessions(cls, sessions: Optional[List[str]] = None) -> "ClientPool":
+        sessions = sessions or config.STRING_SESSIONS
+        return cls(
+            [
+                TelegramClientWrapper(session, name=f"client-{index}")
+                for index, session in enumerate(sessions)
+            ]
+        )
+
+    @property
+    def primary(self) -> TelegramClientWrapper:
+        return self.clients[0]
+
+    async def _start_client(self, client: TelegramClientWrapper):
+        if not client.is_connected():
+            await client.connect()
+        await client.start()
+        if client.channel is None:  # Not restored from a snapshot
+            client.channel = await client.get_entity(client.channel_id)
+        client.healthy = True
+        logger.info(f"Connected to Telegram with {client.name}")
+
+    async def start(self):
+        # The primary client must come up; the others are best effort
+        await self._start_client(self.primary)
+        results = await asyncio.gather(
+            *(self._start_client(client) for client in self.clients[1:]),
+            return_exceptions=True,
+        )
+        for client, result in zip(self.clients[1:], results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to start {client.name}: {result}")
+
+    async def stop(self):
+        for client in self.clients:
+            await client.sender_pool.close()
+            await client.disconnect()
+            client.healthy = False
+
+    def available(self) -> List[TelegramClientWrapper]:
+        now = time.monotonic()
+        return [
+            client
+            for client in self.clients
+            if client.healthy and client.flood_until <= now
+        ]
+
+    def pick(self) -> TelegramClientWrapper:
+        """
+        Returns the least-loaded healthy client, or the one that leaves its
+        FloodWait first when every client is waiting.
+        """
+        available = self.available()
+        if available:
+            return min(available, key=lambda client: client.in_flight)
+        healthy = [client for client in self.clients if client.healthy]
+        return min(healthy or self.clients, key=lambda client: client.flood_until)
+
+    @asynccontextmanager
+    async def acquire(self, client: Optional[TelegramClientWrapper] = None):
+        client = client or self.pick()
+        client.in_flight += 1
+        try:
+            yield client
+        except FloodWaitError as e:
+            client.flood_until = time.monotonic() + e.seconds
+            logger.warning(f"{client.name} is in FloodWait for {e.seconds}s")
+            raise
+        finally:
+            client.in_flight -= 1
+
+    async def run(self, fn: Callable[[TelegramClientWrapper], Awaitable[T]]) -> T:
+        """
+        Runs ``fn`` with the least-loaded client, retrying with another client
+        while the chosen one is put in FloodWait.
+        """
+        while True:
+            try:
+                async with self.acquire() as client:
+                    token = rpc_failover.set(
+                        lambda: any(other is not client for other in self.available())
+                    )
+                    try:
+                        return await fn(client)
+                    finally:
+                        rpc_failover.reset(token)
+            except FloodWaitError:
+                if not self.available():
+                    raise
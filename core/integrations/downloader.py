@@ -0,0 +1,58 @@
+import asyncio
+import collections
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Tuple
+
+
+class ParallelDownloader:
+    def __init__(self, concurrency=4, buffer_size=8):
+        """
+        Initializes the ParallelDownloader.
+
+        Chunks are fetched concurrently but always yielded in the order of the
+        requested indexes. At most ``buffer_size`` chunks are held at once
+        (in flight plus downloaded and waiting for an earlier chunk), which
+        bounds both the reorder buffer and the memory used per stream.
+
+        :param concurrency: Maximum number of chunk fetches running at the same time (default 4).
+        :param buffer_size: Maximum number of chunks held in the reorder buffer (default 8).
+        """
+        self.concurrency = max(1, concurrency)
+        self.buffer_size = max(self.concurrency, buffer_size)
+
+    async def iter_chunks(
+        self,
+        fetch: Callable[[int], Awaitable[bytes]],
+        chunk_indexes: Iterable[int],
+    ) -> AsyncIterator[Tuple[int, bytes]]:
+        """
+        Yields ``(chunk_index, chunk)`` in order while fetching ahead.
+
+        :param fetch: Coroutine function that returns the bytes of a chunk index.
+        :param chunk_indexes: Chunk indexes to fetch, in the order they should be yielded.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = collections.deque()
+        indexes = iter(chunk_indexes)
+
+        async def limited_fetch(chunk_index):
+            async with semaphore:
+                return await fetch(chunk_index)
+
+        def fill():
+            while len(pending) < self.buffer_size:
+                chunk_index = next(indexes, None)
+                if chunk_index is None:
+                    return
+                task = asyncio.ensure_future(limited_fetch(chunk_index))
+                pending.append((chunk_index, task))
+
+        try:
+            fill()
+            while pending:
+                chunk_index, task = pending.popleft()
+                chunk = await task
+                fill()
+                yield chunk_index, chunk
+        finally:
+            for _, task in pending:
+                task.cancel()
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from telethon.tl.types import Message
+
+
+class MessageLoader:
+    def __init__(
+        self,
+        load: Callable[[List[int]], Awaitable[Dict[int, Message]]],
+        window=0.005,
+        max_batch=100,
+    ):
+        """
+        Initializes the MessageLoader.
+
+        Coalesces message lookups: every ID asked for within ``window``
+        seconds of the first one is fetched by a single ``load`` call, which
+        is made as soon as ``max_batch`` IDs are waiting. IDs already being
+        fetched are not asked for again. The batch runs with the RPC priority
+        and deadline of the lookup that opened it.
+
+        :param load: Coroutine function returning the messages found among a list of IDs, by ID.
+        :param window: Seconds to wait for more IDs before fetching (default 5 ms).
+        :param max_batch: Maximum number of IDs per fetch (default 100).
+        """
+        self.load = load
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.in_flight: Dict[int, asyncio.Future] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+
+    async def load_many(self, message_ids: Iterable[int]) -> List[Optional[Message]]:
+        """
+        Returns the messages with the given IDs, None for those that don't exist.
+        """
+        futures = [self._future(message_id) for message_id in message_ids]
+        return list(await asyncio.gather(*map(asyncio.shield, futures)))
+
+    async def load_one(self, message_id: int) -> Optional[Message]:
+        return (await self.load_many([message_id]))[0]
+
+    def _future(self, message_id: int) -> asyncio.Future:
+        future = self.pending.get(message_id) or self.in_flight.get(message_id)
+        if future is not None:
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be left to await a failed batch
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.pending[message_id] = future
+        if len(self.pending) >= self.max_batch:
+            self._dispatch()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.window, self._dispatch
+            )
+        return future
+
+    def _dispatch(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            self.in_flight.update(batch)
+            self.batches += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: Dict[int, asyncio.Future]):
+        try:
+            messages = await self.load(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for message_id, future in batch.items():
+                if not future.done():
+                    future.set_result(messages.get(message_id))
+        finally:
+            for message_id, future in batch.items():
+                if not future.done():  # The fetch itself was cancelled
+                    future.cancel()
+                if self.in_flight.get(message_id) is future:
+                    del self.in_flight[message_id]
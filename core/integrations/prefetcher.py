@@ -0,0 +1,145 @@
+import asyncio
+import collections
+import time
+from typing import Awaitable, Callable, Optional
+
+from core import logger
+
+
+class PlaybackSession:
+    def __init__(self, client_key, document_id):
+        """
+        Tracks the chunks served to one client for one document and the
+        chunks prefetched for its next range request.
+
+        :param client_key: Identifier of the client (address and user agent).
+        :param document_id: Telegram document ID being played.
+        """
+        self.client_key = client_key
+        self.document_id = document_id
+        self.next_chunk: Optional[int] = None
+        self.chunks = collections.OrderedDict()  # chunk_index -> asyncio.Task
+        self.last_seen = time.monotonic()
+        self.load: Optional[Callable[[int], Awaitable[bytes]]] = None
+
+    def is_sequential(self, first_chunk: int) -> bool:
+        # A range that ends mid-chunk is continued from that same chunk
+        return self.next_chunk is not None and first_chunk in (
+            self.next_chunk - 1,
+            self.next_chunk,
+        )
+
+    async def get_chunk(self, chunk_index: int) -> bytes:
+        task = self.chunks.pop(chunk_index, None)
+        if task is not None:
+            try:
+                return await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                logger.debug(f"Prefetch of chunk {chunk_index} failed: {e}")
+        return await self.load(chunk_index)
+
+    def prefetch(self, first_chunk: int, last_chunk: int, keep_from: int):
+        """
+        Prefetches the chunks between first_chunk and last_chunk and drops the
+        ones outside keep_from..last_chunk.
+        """
+        for chunk_index in list(self.chunks):
+            if not keep_from <= chunk_index <= last_chunk:
+                self.chunks.pop(chunk_index).cancel()
+
+        for chunk_index in range(first_chunk, last_chunk + 1):
+            if chunk_index not in self.chunks:
+                task = asyncio.ensure_future(self.load(chunk_index))
+                # Failed prefetches are retried by get_chunk, never raised here
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self.chunks[chunk_index] = task
+
+    def cancel(self):
+        for task in self.chunks.values():
+            task.cancel()
+        self.chunks.clear()
+
+
+class Prefetcher:
+    def __init__(self, read_ahead=4, ttl=60, max_sessions=256):
+        """
+        Initializes the Prefetcher.
+
+        Each ``(client_key, document_id)`` pair gets a playback session. When a
+        range request continues where the previous one of the same session
+        ended, the next ``read_ahead`` chunks after it are prefetched into
+        memory so the following request is served without waiting on Telegram.
+        A request anywhere else is treated as a seek and drops the prefetched
+        chunks.
+
+        :param read_ahead: Number of chunks to keep prefetched per session (default 4).
+        :param ttl: Seconds after which an idle session expires (default 60).
+        :param max_sessions: Maximum number of sessions kept at once (default 256).
+        """
+        self.read_ahead = read_ahead
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = collections.OrderedDict()
+
+    def start_request(
+        self,
+        client_key,
+        document_id,
+        first_chunk: int,
+        last_chunk: int,
+        max_chunk: int,
+        load: Callable[[int], Awaitable[bytes]],
+    ) -> PlaybackSession:
+        """
+        Registers a range request on the client's session and returns it.
+
+        :param client_key: Identifier of the client.
+        :param document_id: Telegram document ID being played.
+        :param first_chunk: First chunk index of the requested range.
+        :param last_chunk: Last chunk index of the requested range.
+        :param max_chunk: Last chunk index of the document.
+        :param load: Coroutine function that loads a chunk index.
+        """
+        self._expire()
+
+        key = (client_key, document_id)
+        session = self.sessions.pop(key, None)
+        if session is None:
+            session = PlaybackSession(client_key, document_id)
+        self.sessions[key] = session
+        self._evict()
+
+        session.last_seen = time.monotonic()
+        session.load = load
+
+        if session.is_sequential(first_chunk) and self.read_ahead > 0:
+            session.prefetch(
+                last_chunk + 1,
+                min(last_chunk + self.read_ahead, max_chunk),
+                keep_from=first_chunk,
+            )
+        else:
+            session.cancel()
+
+        session.next_chunk = last_chunk + 1
+        return session
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, session in list(self.sessions.items()):
+            if now - session.last_seen > self.ttl:
+                session.cancel()
+                del self.sessions[key]
+
+    def _evict(self):
+        while len(self.sessions) > self.max_sessions:
+            _, session = self.sessions.popitem(last=False)
+            session.cancel()
+
+    def clear(self):
+        for session in self.sessions.values():
+            session.cancel()
+        self.sessions.clear()
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core import logger
+from .scheduler import Priority, rpc_context
+
+
+class ReactionRefresher:
+    def __init__(
+        self,
+        select: Callable[[], Awaitable[List[int]]],
+        fetch: Callable[[List[int]], Awaitable[Dict[int, object]]],
+        apply: Callable[[Dict[int, object]], Awaitable[int]],
+        min_interval=30,
+        max_interval=600,
+        batch_size=100,
+    ):
+        """
+        Initializes the ReactionRefresher.
+
+        Periodically re-reads the reaction counts of a selection of posts
+        (typically the newest and the most popular ones) in batches of
+        ``batch_size`` messages per RPC, at background priority. The wait
+        between rounds adapts to how much changed: it halves when more than
+        a tenth of the polled messages changed and grows by half when none
+        did, always staying between ``min_interval`` and ``max_interval``.
+
+        :param select: Coroutine function returning the message IDs to poll.
+        :param fetch: Coroutine function returning the reactions of a batch of message IDs.
+        :param apply: Coroutine function storing fetched reactions, returning how many changed.
+        :param min_interval: Shortest wait between rounds in seconds (0 disables the refresher).
+        :param max_interval: Longest wait between rounds in seconds.
+        :param batch_size: Maximum number of messages per RPC (default 100).
+        """
+        self.select = select
+        self.fetch = fetch
+        self.apply = apply
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.batch_size = batch_size
+        self.interval = min_interval
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.min_interval or self.task is not None:
+            return
+        logger.info(
+            f"Starting reaction refresher with min_interval: {self.min_interval} "
+            f"and max_interval: {self.max_interval}"
+        )
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        with rpc_context(Priority.BACKGROUND):
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    polled, changed = await self.refresh()
+                except Exception as e:
+                    logger.warning(f"Failed to refresh reactions: {e}")
+                    continue
+                self._adapt(polled, changed)
+
+    async def refresh(self) -> tuple:
+        """
+        Polls every selected message once and stores the counts that changed.
+        :return: The number of polled messages and the number that changed.
+        """
+        message_ids = await self.select()
+        batches = [
+            message_ids[i : i + self.batch_size]
+            for i in range(0, len(message_ids), self.batch_size)
+        ]
+        changed = 0
+        for batch in batches:
+            reactions = await self.fetch(batch)
+            if reactions:
+                changed += await self.apply(reactions)
+        return len(message_ids), changed
+
+    def _adapt(self, polled: int, changed: int):
+        if polled and changed * 10 > polled:
+            self.interval = max(self.min_interval, self.interval / 2)
+        elif not changed:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        logger.debug(
+            f"Refreshed reactions of {polled} messages, {changed} changed; "
+            f"next round in {self.interval:.0f}s"
+        )
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
@@ -0,0 +1,179 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from telethon.errors import FloodWaitError
+
+from core import logger
+from core.exceptions import ServiceUnavailableException
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    STREAM = 0
+    POST = 1
+    LISTING = 2
+    SEARCH = 3
+    BACKGROUND = 4
+
+
+rpc_priority: ContextVar[Priority] = ContextVar("rpc_priority", default=Priority.POST)
+rpc_deadline: ContextVar[Optional[float]] = ContextVar("rpc_deadline", default=None)
+# Set by the client pool while another client could take over the RPCs
+rpc_failover: ContextVar[Optional[Callable[[], bool]]] = ContextVar(
+    "rpc_failover", default=None
+)
+
+
+@contextmanager
+def rpc_context(priority: Priority, timeout: Optional[float] = None):
+    """
+    Sets the priority class and deadline of every RPC made inside the block,
+    including the ones made by tasks it starts.
+    :param priority: Priority class of the RPCs.
+    :param timeout: Seconds the whole block may spend waiting on Telegram (None waits forever).
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    priority_token = rpc_priority.set(priority)
+    deadline_token = rpc_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        rpc_priority.reset(priority_token)
+        rpc_deadline.reset(deadline_token)
+
+
+class RpcDeadlineExceeded(ServiceUnavailableException):
+    def __init__(self, method: str, wait: float):
+        super().__init__(f"Telegram is rate limiting {method}, retry in {wait:.0f}s")
+        self.method = method
+        self.retry_after = wait
+
+
+class _MethodState:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []  # heap of (priority, seq, future)
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float, position: int = 0) -> float:
+        """
+        Seconds until the caller at ``position`` in the queue can run.
+        """
+        self.refill(now)
+        missing = position + 1 - self.tokens
+        token_delay = missing / self.rate if missing > 0 else 0.0
+        return max(self.blocked_until - now, token_delay)
+
+
+class RpcScheduler:
+    def __init__(
+        self,
+        rate_limits: Dict[str, Tuple[float, float]],
+        default_rate_limit: Tuple[float, float] = (10, 20),
+    ):
+        """
+        Initializes the RpcScheduler.
+
+        Every RPC takes a token from the bucket of its method. When the bucket
+        is empty, callers queue by priority class, so active stream chunks go
+        before post fetches, listings, searches and background work. A
+        FloodWait blocks the method for its duration instead of sleeping
+        inside one request, and callers whose predicted wait goes over their
+        deadline fail fast with ``RpcDeadlineExceeded``. A FloodWait is only
+        waited out when no other client can take the request over.
+
+        :param rate_limits: Mapping of request name to ``(rate per second, burst)``.
+        :param default_rate_limit: ``(rate per second, burst)`` for any other request.
+        """
+        self.rate_limits = rate_limits
+        self.default_rate_limit = default_rate_limit
+        self.methods: Dict[str, _MethodState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, method: str) -> _MethodState:
+        state = self.methods.get(method)
+        if state is None:
+            rate, capacity = self.rate_limits.get(method, self.default_rate_limit)
+            state = self.methods[method] = _MethodState(rate, capacity)
+        return state
+
+    @staticmethod
+    def _remaining() -> Optional[float]:
+        deadline = rpc_deadline.get()
+        return None if deadline is None else deadline - time.monotonic()
+
+    async def _acquire(self, method: str, state: _MethodState, priority: Priority):
+        now = time.monotonic()
+        ahead = sum(1 for waiter in state.waiters if waiter[0] <= priority)
+        wait = state.delay(now, ahead)
+        remaining = self._remaining()
+        if remaining is not None and wait > remaining:
+            raise RpcDeadlineExceeded(method, wait)
+
+        if not state.waiters and wait <= 0:
+            state.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(state.waiters, (priority, next(self._seq), future))
+        if state.dispatcher is None or state.dispatcher.done():
+            state.dispatcher = asyncio.create_task(self._dispatch(state))
+
+        try:
+            await asyncio.wait_for(future, remaining)
+        except asyncio.TimeoutError:
+            raise RpcDeadlineExceeded(method, state.delay(time.monotonic()))
+
+    @staticmethod
+    async def _dispatch(state: _MethodState):
+        while state.waiters:
+            delay = state.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(state.waiters)
+            if future.done():  # The caller gave up
+                continue
+            state.tokens -= 1
+            future.set_result(None)
+
+    async def call(self, method: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs an RPC once its method has a token for the current priority,
+        waiting out FloodWaits that fit in the current deadline when no other
+        client is available.
+        :param method: Name of the request, used to pick the token bucket.
+        :param fn: Coroutine function that performs the RPC.
+        """
+        state = self._state(method)
+        priority = rpc_priority.get()
+        while True:
+            await self._acquire(method, state, priority)
+            try:
+                return await fn()
+            except FloodWaitError as e:
+                state.blocked_until = max(
+                    state.blocked_until, time.monotonic() + e.seconds
+                )
+                logger.warning(f"FloodWait of {e.seconds}s on {method}")
+                failover = rpc_failover.get()
+                if failover is not None and failover():
+                    raise
+                remaining = self._remaining()
+                if remaining is not None and e.seconds > remaining:
+                    raise
@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import random
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, List
+
+from core import logger
+
+
+class PooledSender:
+    def __init__(self, sender):
+        self.sender = sender
+        self.in_use = 0
+
+
+class SenderPool:
+    def __init__(self, client, size=2, keepalive=60):
+        """
+        Initializes the SenderPool.
+
+        Keeps up to ``size`` authorized exported senders per foreign DC on top
+        of the client, so downloads from those DCs don't pay for the auth
+        export/import and connection setup on the request path, and
+        concurrent downloads are spread over several connections. Files on
+        the home DC use the client's own sender, which is always connected.
+
+        :param client: Connected TelegramClientWrapper.
+        :param size: Maximum number of senders per DC (default 2).
+        :param keepalive: Seconds between keep-alive pings of pooled senders (default 60).
+        """
+        self.client = client
+        self.size = max(1, size)
+        self.keepalive = keepalive
+        self.senders: Dict[int, List[PooledSender]] = collections.defaultdict(list)
+        self.locks: Dict[int, asyncio.Lock] = collections.defaultdict(asyncio.Lock)
+        self.dc_counts = collections.Counter()
+        self._keepalive_task = None
+
+    def is_home_dc(self, dc_id) -> bool:
+        return not dc_id or dc_id == self.client.session.dc_id
+
+    @asynccontextmanager
+    async def acquire(self, dc_id):
+        """
+        Borrows the least-loaded sender for a DC, creating a new one while
+        the pool for that DC is below its size and every sender is busy.
+        """
+        self.dc_counts[dc_id] += 1
+        if self.is_home_dc(dc_id):
+            yield self.client._sender
+            return
+
+        pooled = await self._least_loaded(dc_id)
+        pooled.in_use += 1
+        try:
+            yield pooled.sender
+        except ConnectionError:
+            await self._drop(dc_id, pooled)
+            raise
+        finally:
+            pooled.in_use -= 1
+
+    async def _least_loaded(self, dc_id) -> PooledSender:
+        async with self.locks[dc_id]:
+            pool = self.senders[dc_id]
+            # Senders whose connection died are replaced, never lent out
+            for pooled in [p for p in pool if not p.sender.is_connected()]:
+                await self._drop(dc_id, pooled)
+            pooled = min(pool, key=lambda p: p.in_use, default=None)
+            if pooled is None or (pooled.in_use and len(pool) < self.size):
+                pooled = await self._create(dc_id)
+            return pooled
+
+    async def _create(self, dc_id) -> PooledSender:
+        logger.info(f"Creating pooled sender for DC {dc_id}")
+        sender = await self.client._create_exported_sender(dc_id)
+        sender.dc_id = dc_id
+        pooled = PooledSender(sender)
+        self.senders[dc_id].append(pooled)
+
+        if self._keepalive_task is None and self.keepalive:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+        return pooled
+
+    async def _drop(self, dc_id, pooled: PooledSender):
+        if pooled not in self.senders[dc_id]:
+            return
+        logger.info(f"Dropping disconnected pooled sender for DC {dc_id}")
+        self.senders[dc_id].remove(pooled)
+        try:
+            await pooled.sender.disconnect()
+        except Exception:
+            pass
+
+    async def warm_up(self, dc_ids: Iterable[int]):
+        """
+        Fills the pool for the given DCs up to its size.
+        """
+        for dc_id in dc_ids:
+            if self.is_home_dc(dc_id):
+                continue
+            try:
+                async with self.locks[dc_id]:
+                    while len(self.senders[dc_id]) < self.size:
+                        await self._create(dc_id)
+            except Exception as e:
+                logger.warning(f"Failed to warm up senders for DC {dc_id}: {e}")
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive)
+            for pool in list(self.senders.values()):
+                for pooled in pool:
+                    try:
+                        pooled.sender._keepalive_ping(random.randrange(-(2**63), 2**63))
+                    except ConnectionError:
+                        pass
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        for pool in self.senders.values():
+            for pooled in pool:
+                await pooled.sender.disconnect()
+        self.senders.clear()
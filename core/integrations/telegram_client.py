@@ -1,18 +1,66 @@
-from telethon import TelegramClient
+import hashlib
+from typing import Awaitable, Callable, List
 
-from core import API_ID, API_HASH, STRING_SESSION, CHANNEL_ID
-from core.utils import decode_session
+from telethon import TelegramClient, events
+from telethon.tl.types import Message
 
-telethon_session = decode_session(STRING_SESSION)
+from core import API_ID, API_HASH, STRING_SESSION, CHANNEL_ID, config
+from core.utils import decode_session
+from .scheduler import RpcScheduler
+from .sender_pool import SenderPool
 
 
 class TelegramClientWrapper(TelegramClient):
 
-    def __init__(self):
+    def __init__(self, session_string=STRING_SESSION, name="main"):
         super().__init__(
-            telethon_session,
+            decode_session(session_string),
             api_id=API_ID,
             api_hash=API_HASH,
-            flood_sleep_threshold=240,
+            # FloodWaits are handled by the scheduler, per method and deadline
+            flood_sleep_threshold=0,
         )
         self.channel_id = CHANNEL_ID
+        self.name = name
+        # Identifies the account without exposing its session
+        self.session_key = hashlib.sha256(session_string.encode()).hexdigest()[:16]
+        self.channel = None
+        self.healthy = False
+        self.in_flight = 0
+        self.flood_until = 0.0
+        self.sender_pool = SenderPool(
+            self,
+            size=config.SENDER_POOL_SIZE,
+            keepalive=config.SENDER_POOL_KEEPALIVE,
+        )
+        self.scheduler = RpcScheduler(
+            config.RPC_RATE_LIMITS, config.RPC_DEFAULT_RATE_LIMIT
+        )
+
+    async def _call(self, sender, request, ordered=False, flood_sleep_threshold=None):
+        call = super()._call
+        return await self.scheduler.call(
+            request.__class__.__name__,
+            lambda: call(sender, request, ordered, flood_sleep_threshold),
+        )
+
+    def watch_channel(
+        self,
+        on_messages: Callable[[List[Message]], Awaitable[None]],
+        on_delete: Callable[[List[int]], Awaitable[None]],
+    ):
+        """
+        Subscribes to the updates of the channel.
+        :param on_messages: Called with new and edited messages.
+        :param on_delete: Called with the IDs of deleted messages.
+        """
+
+        async def new_or_edited(event):
+            await on_messages([event.message])
+
+        async def deleted(event):
+            await on_delete(event.deleted_ids)
+
+        self.add_event_handler(new_or_edited, events.NewMessage(chats=self.channel))
+        self.add_event_handler(new_or_edited, events.MessageEdited(chats=self.channel))
+        self.add_event_handler(deleted, events.MessageDeleted(chats=self.channel))
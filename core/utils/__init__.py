@@ -1,3 +1,15 @@
 from .datetime import utcnow
 from .decode_session import decode_session
 from .parse_content import parse_message_content
+from .bulk_parser import BulkParser
+from .single_flight import SingleFlight
+from .range_planner import RangePlan, plan_range
+from .conditional import (
+    http_date,
+    if_range_matches,
+    is_not_modified,
+    make_etag,
+    parse_range_header,
+)
+from .cursor import decode_cursor, encode_cursor
+from .reaction_ranking import ReactionRanking
@@ -0,0 +1,92 @@
+import asyncio
+import collections
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Union
+
+from .parse_content import MovieData, parse_message_content
+
+
+def _parse_batch(contents: List[str]) -> List[MovieData]:
+    return [parse_message_content(content) for content in contents]
+
+
+class BulkParser:
+    def __init__(self, workers=1, batch_size=32, max_pending=None):
+        """
+        Initializes the BulkParser.
+
+        Parses message texts in bulk on a pool of worker processes, for
+        backfills and reindexing. Texts are sent in batches of ``batch_size``
+        and results are yielded in input order. At most ``max_pending``
+        batches are out at once, and no more input is read until the oldest
+        one is consumed, so a slow consumer holds the producer back instead
+        of piling up results. Parsing never runs on the event loop: without
+        workers, batches are parsed on the default thread pool.
+
+        :param workers: Number of worker processes (0 parses on a thread).
+        :param batch_size: Number of texts sent to a worker at once (default 32).
+        :param max_pending: Maximum number of batches out at once (default twice the workers).
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending or max(2 * workers, 2)
+        self.executor: Optional[Executor] = None
+
+    def _executor(self) -> Optional[Executor]:
+        if self.workers and self.executor is None:
+            # Forking a process that runs threads and an event loop isn't safe
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def _batches(
+        self, contents: Union[Iterable[str], AsyncIterable[str]]
+    ) -> AsyncIterator[List[str]]:
+        batch = []
+        if isinstance(contents, AsyncIterable):
+            async for content in contents:
+                batch.append(content)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        else:
+            for content in contents:
+                batch.append(content)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    async def parse_many(
+        self, contents: Union[Iterable[str], AsyncIterable[str]]
+    ) -> AsyncIterator[MovieData]:
+        """
+        Yields the parsed content of every text, in order.
+        """
+        loop = asyncio.get_running_loop()
+        pending = collections.deque()
+        try:
+            async for batch in self._batches(contents):
+                pending.append(
+                    loop.run_in_executor(self._executor(), _parse_batch, batch)
+                )
+                # Hand out what is already done before reading more input
+                while pending and (
+                    pending[0].done() or len(pending) >= self.max_pending
+                ):
+                    for data in await pending.popleft():
+                        yield data
+            while pending:
+                for data in await pending.popleft():
+                    yield data
+        finally:
+            for future in pending:  # The consumer stopped early
+                future.cancel()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
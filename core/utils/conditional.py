@@ -0,0 +1,95 @@
+from datetime import datetime
+from email.utils import format_datetime
+from typing import List, Optional, Tuple
+
+MAX_RANGES = 16
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a strong ETag from the identifiers of an immutable Telegram file.
+    :param parts: Identifiers such as the document or photo ID.
+    :return:
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def http_date(date: Optional[datetime]) -> Optional[str]:
+    if date is None:
+        return None
+    return format_datetime(date, usegmt=True)
+
+
+def _etags(header: str) -> List[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Checks an If-None-Match header (weak comparison) against the current ETag.
+    """
+    if not if_none_match:
+        return False
+    tags = _etags(if_none_match)
+    return "*" in tags or etag in tags
+
+
+def if_range_matches(
+    if_range: Optional[str], etag: str, last_modified: Optional[str]
+) -> bool:
+    """
+    Checks whether the Range header should be honoured given an If-Range
+    header, which holds either an ETag (strong comparison) or a date.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    return last_modified is not None and if_range == last_modified
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parses a ``bytes=`` Range header into inclusive ``(start, end)`` pairs.
+    Returns None when the header is malformed or asks for too many ranges,
+    in which case it should be ignored, and an empty list when none of the
+    ranges can be satisfied.
+    :param range_header: Value of the Range header.
+    :param size: Total size of the file.
+    :return:
+    """
+    unit, _, ranges_spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges_spec:
+        return None
+
+    specs = [spec.strip() for spec in ranges_spec.split(",") if spec.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+
+            start = int(first)
+            end = int(last) if last else size - 1
+        except ValueError:
+            return None
+
+        if start > end and last:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    return ranges
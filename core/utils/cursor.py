@@ -0,0 +1,28 @@
+import base64
+import json
+from typing import Any, Dict
+
+from core.exceptions import BadRequestException
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """
+    Encodes a pagination position as an opaque, URL-safe cursor.
+    """
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decodes a cursor made by encode_cursor.
+    :raises BadRequestException: If the cursor is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(data)
+    except ValueError:
+        raise BadRequestException("Invalid cursor")
+    if not isinstance(payload, dict):
+        raise BadRequestException("Invalid cursor")
+    return payload
@@ -1,6 +1,6 @@
 import re
 import unicodedata
-from typing import List, Callable
+from typing import List, Callable, Optional
 
 
 class MovieData:
@@ -49,12 +49,15 @@ class FieldDefinition:
         regex: List[str],
         process: Callable,
         is_multiline: bool = False,
+        keywords: Optional[List[str]] = None,
     ):
         self.field = field
         self.labels = labels
         self.regex = [re.compile(r) for r in regex]
         self.process = process
         self.is_multiline = is_multiline
+        # Every line the regexes match contains one of these
+        self.keywords = keywords or labels
 
 
 def is_emoji(character: str) -> bool:
@@ -169,45 +172,56 @@ field_definitions = [
             r"^.*?(?:📺|Título:)\s*(.*?)(?:\s*[-—:]?\s*#(\d{4}y?)?.*?)?$",
         ],
         process_title,
+        keywords=["📺", "Título:"],
     ),
     FieldDefinition(
         "country_of_origin",
         ["País de Origem:", "📍 País de Origem:", "Pais de Origem:"],
         [r"^.*?Pa[íi]s de Origem:\s*(.*)$"],
         process_country_of_origin,
+        keywords=["País de Origem:", "Pais de Origem:"],
     ),
     FieldDefinition(
         "directors",
         ["Direção:", "Diretor:", "👑 Direção:", "👑 Direção/Roteiro:"],
         [r"^.*?(?:Direção|Diretor|Direção\/Roteiro):\s*(.*)$"],
         process_directors,
+        keywords=["Direção", "Diretor:"],
     ),
     FieldDefinition(
         "writers",
         ["Roteiro:", "Roteirista:", "Roteiristas:", "✏️ Roteirista:", "✏️ Roteiristas:"],
         [r"^.*?(?:Roteiro|Roteirista|Roteiristas):\s*(.*)$"],
         process_writers,
+        keywords=["Roteiro:", "Roteirista:", "Roteiristas:"],
     ),
     FieldDefinition(
-        "cast", ["Elenco:", "✨ Elenco:"], [r"^.*?Elenco:\s*(.*)$"], process_cast
+        "cast",
+        ["Elenco:", "✨ Elenco:"],
+        [r"^.*?Elenco:\s*(.*)$"],
+        process_cast,
+        keywords=["Elenco:"],
     ),
     FieldDefinition(
         "languages",
         ["Idioma:", "Idiomas:", "📣 Idiomas:", "💬 Idiomas:"],
         [r"^.*?(?:Idiomas?|Idioma):\s*(.*)$"],
         process_languages,
+        keywords=["Idioma:", "Idiomas:"],
     ),
     FieldDefinition(
         "subtitles",
         ["Legenda:", "Legendado:", "💬 Legendado:"],
         [r"^.*?(?:Legenda|Legendado):\s*(.*)$"],
         process_subtitles,
+        keywords=["Legenda:", "Legendado:"],
     ),
     FieldDefinition(
         "genres",
         ["Gênero:", "Gêneros:", "🎭 Gêneros:"],
         [r"^.*?(?:Gêneros?|Gênero):\s*(.*)$"],
         process_genres,
+        keywords=["Gênero:", "Gêneros:"],
     ),
     FieldDefinition(
         "synopsis",
@@ -215,6 +229,7 @@ field_definitions = [
         [r"^.*?(?:Sinopse|🗣 Sinopse)[:：]?\s*(.*)$"],
         lambda match, data, buffer: process_multiline(match, data, buffer),
         is_multiline=True,
+        keywords=["Sinopse"],
     ),
     FieldDefinition(
         "curiosities",
@@ -222,9 +237,90 @@ field_definitions = [
         [r"^.*?Curiosidades[:：]?\s*(.*)$"],
         lambda match, data, buffer: process_multiline(match, data, buffer),
         is_multiline=True,
+        keywords=["Curiosidades"],
     ),
 ]
 
+end_of_field_markers = [
+    "▶",
+    "▶️",
+    "Para outros conteúdos",
+    "💡 Curiosidades:",
+    "🥇 Prêmios:",
+    "🥈 Prêmios:",
+    "Prêmios:",
+    "Clique Para Entrar",
+    "🚨 Para outros conteúdos",
+    "📣 Idiomas:",
+    "💬 Legendado:",
+    "📣",
+    "💬",
+    "#",
+    "✨ Elenco:",
+    "📢",
+]
+
+
+class LabelDispatcher:
+    LABEL = 1
+    MARKER = 2
+
+    def __init__(self, fields: List[FieldDefinition], markers: List[str]):
+        """
+        Classifies a line in one scan: whether it holds a field label or an
+        end-of-field marker, and which fields' regexes can match it.
+
+        Labels, markers and field keywords are compiled into one pattern of
+        lookaheads, longest first, so every match reports the longest literal
+        starting at its position. The literals that are prefixes of it start
+        there too, so their flags are folded into its own beforehand.
+
+        :param fields: Field definitions, in the order their regexes are tried.
+        :param markers: Literals that end a multiline field.
+        """
+        flags = {}
+        for field_def in fields:
+            for label in field_def.labels:
+                flags[label] = flags.get(label, 0) | self.LABEL
+        for marker in markers:
+            flags[marker] = flags.get(marker, 0) | self.MARKER
+        self.fields = []
+        for index, field_def in enumerate(fields):
+            bit = 4 << index
+            self.fields.append((bit, field_def))
+            for keyword in field_def.keywords:
+                flags[keyword] = flags.get(keyword, 0) | bit
+
+        self.flags = {}
+        for literal in flags:
+            for prefix, prefix_flags in flags.items():
+                if literal.startswith(prefix):
+                    self.flags[literal] = self.flags.get(literal, 0) | prefix_flags
+        literals = sorted(flags, key=len, reverse=True)
+        # Positions that can't start any literal are rejected by one set test
+        first = "".join(sorted({literal[0] for literal in literals}))
+        self.pattern = re.compile(
+            f"(?=[{re.escape(first)}])(?=({'|'.join(map(re.escape, literals))}))"
+        )
+
+    def classify(self, line: str) -> int:
+        """
+        Returns the flags of every label, marker and keyword found in line.
+        """
+        flags = 0
+        for literal in set(self.pattern.findall(line)):
+            flags |= self.flags[literal]
+        return flags
+
+    def candidates(self, flags: int) -> List[FieldDefinition]:
+        """
+        Returns the fields whose regexes can match a line with these flags.
+        """
+        return [field_def for bit, field_def in self.fields if flags & bit]
+
+
+label_dispatcher = LabelDispatcher(field_definitions, end_of_field_markers)
+
 
 def parse_message_content(content: str) -> MovieData:
     lines = [line.strip() for line in content.split("\n")]
@@ -233,41 +329,14 @@ def parse_message_content(content: str) -> MovieData:
     multiline_buffer = []
     current_field = None
 
-    end_of_field_markers = [
-        "▶",
-        "▶️",
-        "Para outros conteúdos",
-        "💡 Curiosidades:",
-        "🥇 Prêmios:",
-        "🥈 Prêmios:",
-        "Prêmios:",
-        "Clique Para Entrar",
-        "🚨 Para outros conteúdos",
-        "📣 Idiomas:",
-        "💬 Legendado:",
-        "📣",
-        "💬",
-        "#",
-        "✨ Elenco:",
-        "📢",
-    ]
-
-    def line_starts_with_label(line: str, labels: List[str]) -> bool:
-        return any(re.match(f"^.*?{re.escape(label)}", line) for label in labels)
-
     for line in lines:
         if not line:
             continue
 
+        flags = label_dispatcher.classify(line)
         if current_field:
-            is_new_field = any(
-                line_starts_with_label(line, field_def.labels)
-                for field_def in field_definitions
-            )
-            is_end_of_field = any(
-                line_starts_with_label(line, [marker])
-                for marker in end_of_field_markers
-            )
+            is_new_field = flags & LabelDispatcher.LABEL
+            is_end_of_field = flags & LabelDispatcher.MARKER
             if is_new_field or is_end_of_field:
                 setattr(data_info, current_field, " ".join(multiline_buffer).strip())
                 current_field = None
@@ -283,7 +352,7 @@ def parse_message_content(content: str) -> MovieData:
             data_info.tags.extend(tags)
             continue
 
-        for field_def in field_definitions:
+        for field_def in label_dispatcher.candidates(flags):
             for regex in field_def.regex:
                 match = regex.match(line)
                 if match:
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class RangePlan:
+    start: int
+    end: int
+    size: int
+    chunk_size: int = CHUNK_SIZE
+
+    @property
+    def first_chunk(self) -> int:
+        return self.start // self.chunk_size
+
+    @property
+    def last_chunk(self) -> int:
+        return self.end // self.chunk_size
+
+    @property
+    def max_chunk(self) -> int:
+        return (self.size - 1) // self.chunk_size
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    @property
+    def chunk_indexes(self) -> range:
+        return range(self.first_chunk, self.last_chunk + 1)
+
+    def trim(self, chunk_index: int, chunk: bytes) -> bytes:
+        """
+        Cuts an aligned chunk down to the part that falls inside the range.
+        """
+        chunk_offset = chunk_index * self.chunk_size
+        return chunk[
+            max(self.start - chunk_offset, 0) : min(
+                self.end - chunk_offset + 1, len(chunk)
+            )
+        ]
+
+
+def plan_range(start: int, end: int, size: int, chunk_size=CHUNK_SIZE) -> RangePlan:
+    """
+    Maps an inclusive byte range onto the fixed grid of aligned chunks, so
+    every request for a file fetches (and caches) the same chunk indexes.
+    An end past the file size is clamped to the last byte.
+    :param start: First byte of the range.
+    :param end: Last byte of the range (inclusive).
+    :param size: Total size of the file.
+    :param chunk_size: Size of the aligned chunks (default 1 MiB).
+    :return:
+    """
+    end = min(end, size - 1)
+    if start < 0 or start > end:
+        raise ValueError(f"Unsatisfiable range {start}-{end} for size {size}")
+    return RangePlan(start=start, end=end, size=size, chunk_size=chunk_size)
@@ -0,0 +1,85 @@
+import bisect
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ReactionRanking:
+    def __init__(self, windows: Dict[str, Optional[float]]):
+        """
+        Keeps posts ranked by reaction score for several time windows.
+
+        Every window holds a sorted list of the posts published inside it, so
+        the top N of a window is a slice of its list. Posts that age out of a
+        window are dropped lazily, from a heap ordered by publication time,
+        the next time that window is read.
+
+        :param windows: Mapping of window name to its length in seconds (None keeps every post).
+        """
+        self.windows = windows
+        # message_id -> (score, timestamp)
+        self.posts: Dict[int, Tuple[int, float]] = {}
+        self.ranked: Dict[str, List[Tuple[int, int]]] = {name: [] for name in windows}
+        self.expiry: Dict[str, List[Tuple[float, int]]] = {
+            name: [] for name, span in windows.items() if span is not None
+        }
+
+    @staticmethod
+    def _key(message_id: int, score: int) -> Tuple[int, int]:
+        # Highest score first, newest post first among equal scores
+        return -score, -message_id
+
+    def update(self, message_id: int, timestamp: float, score: int):
+        """
+        Adds a post or changes its score.
+        """
+        previous = self.posts.get(message_id)
+        self.remove(message_id)
+        self.posts[message_id] = (score, timestamp)
+        now = time.time()
+        for name, span in self.windows.items():
+            if span is not None and timestamp < now - span:
+                continue
+            bisect.insort(self.ranked[name], self._key(message_id, score))
+            # A score change keeps the expiry entry the post already has
+            if span is not None and (previous is None or previous[1] != timestamp):
+                heapq.heappush(self.expiry[name], (timestamp, message_id))
+
+    def remove(self, message_id: int):
+        entry = self.posts.pop(message_id, None)
+        if entry is None:
+            return
+        key = self._key(message_id, entry[0])
+        for ranked in self.ranked.values():
+            self._discard(ranked, key)
+
+    @staticmethod
+    def _discard(ranked: List[Tuple[int, int]], key: Tuple[int, int]):
+        index = bisect.bisect_left(ranked, key)
+        if index < len(ranked) and ranked[index] == key:
+            del ranked[index]
+
+    def _expire(self, name: str):
+        span = self.windows[name]
+        if span is None:
+            return
+        cutoff = time.time() - span
+        expiry = self.expiry[name]
+        while expiry and expiry[0][0] < cutoff:
+            timestamp, message_id = heapq.heappop(expiry)
+            entry = self.posts.get(message_id)
+            if entry is not None and entry[1] == timestamp:
+                self._discard(self.ranked[name], self._key(message_id, entry[0]))
+
+    def top(self, name: str, count: int) -> List[int]:
+        """
+        Returns the message IDs of the top ``count`` posts of a window.
+        """
+        self._expire(name)
+        return [-message_id for _, message_id in self.ranked[name][:count]]
+
+    def clear(self):
+        self.posts.clear()
+        for name in self.windows:
+            self.ranked[name].clear()
+            self.expiry.get(name, []).clear()
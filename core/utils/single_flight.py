@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Deduplicates concurrent calls that share a key.
+
+        The first caller for a key starts the work; every caller that arrives
+        while it is still running awaits the same result instead of starting
+        its own. Callers are shielded from each other, so one of them being
+        cancelled does not cancel the work for the rest.
+        """
+        self.calls = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+
+    def get_in_flight(self):
+        """
+        Returns the number of calls currently running.
+        """
+        return len(self.calls)
@@ -0,0 +1,24 @@
+import base64
+import os
+import struct
+import tempfile
+
+
+def _offline_session() -> str:
+    # A session string in the layout decode_session reads, never connected
+    address = b"149.154.167.50"
+    data = struct.pack(">BH", 2, len(address)) + address
+    data += struct.pack(">H", 443) + bytes(256)
+    return "1" + base64.urlsafe_b64encode(data).decode()
+
+
+# core.config reads these at import time; the tests don't talk to Telegram
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "offline")
+os.environ.setdefault("CHANNEL_ID", "0")
+os.environ.setdefault("STRING_SESSION", _offline_session())
+_cache_dir = tempfile.mkdtemp(prefix="stream-winx-tests-")
+os.environ.setdefault("CHUNK_CACHE_DIR", os.path.join(_cache_dir, "chunks"))
+os.environ.setdefault("IMAGE_CACHE_DIR", os.path.join(_cache_dir, "images"))
+os.environ.setdefault("POST_INDEX_PATH", "")
+os.environ.setdefault("SNAPSHOT_PATH", "")
@@ -0,0 +1,131 @@
+import pytest
+
+from core.utils.parse_content import parse_message_content
+
+# Captions in the format the channel posts them, with the output the parser
+# gives for each. A change to the parser that alters any of these is a change
+# in what the API returns, so update them on purpose only.
+GOLDEN = [
+    (
+        """📺 Coração Valente #1995y
+📍 País de Origem: 🇺🇸 #EUA
+👑 Direção: #MelGibson
+✏️ Roteirista: #RandallWallace
+✨ Elenco: #MelGibson #SophieMarceau #PatrickMcGoohan
+🎭 Gêneros: #Guerra #Drama #Biografia
+📣 Idiomas: 🇺🇸 #Inglês | 🇧🇷 #Português
+💬 Legendado: 🇧🇷 #Português
+🗣 Sinopse: William Wallace lidera uma revolta dos escoceses contra
+o rei Eduardo I da Inglaterra após a morte de sua esposa.
+💡 Curiosidades: Venceu cinco Oscars, incluindo Melhor Filme.
+🚨 Para outros conteúdos clique aqui
+#Filme #Épico""",
+        {
+            "title": "Coração Valente",
+            "release_date": "1995",
+            "country_of_origin": ["EUA"],
+            "flags_of_origin": ["🇺🇸"],
+            "directors": ["MelGibson"],
+            "writers": ["RandallWallace"],
+            "cast": ["MelGibson", "SophieMarceau", "PatrickMcGoohan"],
+            "languages": ["Inglês", "Português"],
+            "flags_of_language": ["🇺🇸", "🇧🇷"],
+            "subtitles": ["Português"],
+            "flags_of_subtitles": ["🇧🇷"],
+            "genres": ["Guerra", "Drama", "Biografia"],
+            "tags": ["Filme", "Épico"],
+            "synopsis": "William Wallace lidera uma revolta dos escoceses contra "
+            "o rei Eduardo I da Inglaterra após a morte de sua esposa.",
+            "curiosities": None,
+        },
+    ),
+    (
+        """📺 Cidade de Deus: A Luta Não Para #2024y
+📍 País de Origem: 🇧🇷 Brasil
+👑 Direção/Roteiro: #AlineMaia #RenataMelo
+✨ Elenco: #AlexandreRodrigues #AndréiaHorta
+🎭 Gêneros: #Crime #Drama
+📣 Idiomas: 🇧🇷 #Português
+🗣 Sinopse: Vinte anos depois, Buscapé volta à favela onde cresceu.
+#Série""",
+        {
+            "title": "Cidade de Deus: A Luta Não Para",
+            "release_date": "2024",
+            "country_of_origin": ["Brasil"],
+            "flags_of_origin": ["🇧🇷"],
+            "directors": ["AlineMaia", "RenataMelo"],
+            # The line matches both the directors and the writers regexes
+            "writers": ["AlineMaia", "RenataMelo", "AlineMaia", "RenataMelo"],
+            "cast": ["AlexandreRodrigues", "AndréiaHorta"],
+            "languages": ["Português"],
+            "flags_of_language": ["🇧🇷"],
+            "subtitles": [],
+            "flags_of_subtitles": [],
+            "genres": ["Crime", "Drama"],
+            "tags": ["Série"],
+            "synopsis": "Vinte anos depois, Buscapé volta à favela onde cresceu.",
+            "curiosities": None,
+        },
+    ),
+    (
+        """📺 Parasita - #2019y
+📍 País de Origem: 🇰🇷 Coreia do Sul | 🇺🇸 #EUA
+Diretor: #BongJoonHo
+Roteiro: #BongJoonHo #HanJinWon
+Gênero: #Suspense #Comédia
+Idioma: 🇰🇷 #Coreano
+Legenda: 🇧🇷 #Português | 🇺🇸 #Inglês
+Sinopse
+Uma família pobre se infiltra na casa de uma família rica.
+▶️ Assista agora""",
+        {
+            "title": "Parasita",
+            "release_date": "2019",
+            "country_of_origin": ["Coreia do Sul", "EUA"],
+            "flags_of_origin": ["🇰🇷", "🇺🇸"],
+            "directors": ["BongJoonHo"],
+            "writers": ["BongJoonHo", "HanJinWon"],
+            "cast": [],
+            "languages": ["Coreano"],
+            "flags_of_language": ["🇰🇷"],
+            "subtitles": ["Português", "Inglês"],
+            "flags_of_subtitles": ["🇧🇷", "🇺🇸"],
+            "genres": ["Suspense", "Comédia"],
+            "tags": [],
+            "synopsis": "Uma família pobre se infiltra na casa de uma família rica.",
+            "curiosities": None,
+        },
+    ),
+    (
+        """Título: O Auto da Compadecida #2000
+Pais de Origem: Brasil
+🎭 Gêneros: #Comédia
+🗣 Sinopse: As aventuras de João Grilo e Chicó no sertão nordestino.""",
+        {
+            "title": "O Auto da Compadecida",
+            "release_date": "2000",
+            "country_of_origin": ["Brasil"],
+            "flags_of_origin": [],
+            "directors": [],
+            "writers": [],
+            "cast": [],
+            "languages": [],
+            "flags_of_language": [],
+            "subtitles": [],
+            "flags_of_subtitles": [],
+            "genres": ["Comédia"],
+            "tags": [],
+            "synopsis": "As aventuras de João Grilo e Chicó no sertão nordestino.",
+            "curiosities": None,
+        },
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    GOLDEN,
+    ids=["movie", "series", "co_production", "untagged_year"],
+)
+def test_parse_message_content(content, expected):
+    assert parse_message_content(content).to_dict() == expected
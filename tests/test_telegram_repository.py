@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from telethon.tl.types import Message, PeerChannel
+
+from app.repositories import TelegramRepository
+from app.schemas import PaginationData
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _album(number: int, size: int = 2):
+    return [
+        Message(
+            id=number * 10 + index,
+            peer_id=PeerChannel(1),
+            date=START + timedelta(hours=number),
+            message=f"📺 Post {number}" if index == 0 else "",
+            grouped_id=90000 + number,
+        )
+        for index in range(size)
+    ]
+
+
+def _repository(albums: int) -> TelegramRepository:
+    history = [msg for number in range(albums, 0, -1) for msg in _album(number)]
+    history.sort(key=lambda msg: msg.id, reverse=True)
+
+    async def get_history(limit=10, offset_id=0, add_offset=0, **kwargs):
+        below = [msg for msg in history if not offset_id or msg.id < offset_id]
+        return below[add_offset : add_offset + limit]
+
+    repository = TelegramRepository()
+    repository._get_history = get_history
+    return repository
+
+
+async def _page(repository: TelegramRepository, cursor=None, per_page=7):
+    pagination = PaginationData.from_parameters(per_page=per_page, cursor=cursor)
+    groups = await repository._grouped_posts(pagination)
+    return groups, pagination.next_cursor
+
+
+def test_grouped_posts_reads_each_message_once():
+    async def walk():
+        repository = _repository(60)
+        seen = []
+        groups, cursor = await _page(repository)
+        while cursor:
+            seen += [msg.id for group in groups.values() for msg in group]
+            # Reading a cursor again (a retry, a refresh or a prefetch) must
+            # not change what it returns
+            await _page(repository, cursor)
+            groups, cursor = await _page(repository, cursor)
+        seen += [msg.id for group in groups.values() for msg in group]
+        return seen
+
+    seen = asyncio.run(walk())
+    assert len(seen) == len(set(seen)) == 120